@@ -0,0 +1,135 @@
+import asyncio
+import json
+import queue
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+from config import FANOUT_MAX_CONCURRENCY
+from context_builder import build_agent_context
+from conversation_memory import ConversationMemory
+from llm_clients import chat_model_for_agent
+from response_cache import agent_cache_ttl, get_response_cache
+from response_stream import parse_response
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def build_agent_messages(agent: Dict[str, Any], prompt: str, customer_data: Optional[Dict[str, Any]],
+                         dataset_version: Optional[str] = None,
+                         memory: Optional[ConversationMemory] = None
+                         ) -> Tuple[Dict[str, Any], List[BaseMessage]]:
+    """Request context and chat messages for one agent turn
+
+    The customer data is fitted to the agent's token budget (see
+    context_builder); ``dataset_version`` lets the fitted context be cached.
+    With a ``memory`` its summary and recent turns precede the new message.
+    """
+    context = {
+        "agent_type": agent["type"],
+        "parameters": agent["parameters"],
+        "customer_data": build_agent_context(customer_data, agent, dataset_version)
+    }
+    messages = [
+        SystemMessage(content=agent["prompt_template"]),
+        *(memory.messages() if memory is not None else []),
+        HumanMessage(content=json.dumps({
+            "user_message": prompt,
+            "context": context
+        }))
+    ]
+    return context, messages
+
+
+def cache_context(context: Dict[str, Any], memory: Optional[ConversationMemory] = None) -> Dict[str, Any]:
+    """Response cache context: follow-ups only match within the same remembered conversation"""
+    scope = memory.cache_scope() if memory is not None else None
+    return context if scope is None else {**context, "conversation": scope}
+
+
+def response_text(response: Dict[str, Any]) -> str:
+    """The user-facing text of a parsed agent response"""
+    text = response.get("response")
+    return text if isinstance(text, str) else json.dumps(response)
+
+
+async def ainvoke_agent(agent: Dict[str, Any], prompt: str, customer_data: Optional[Dict[str, Any]],
+                        semaphore: asyncio.Semaphore, dataset_version: Optional[str] = None,
+                        memory: Optional[ConversationMemory] = None) -> Dict[str, Any]:
+    """Answer a prompt with one agent, via the response cache when possible
+
+    Returns the agent name, the parsed response (None on failure), the
+    error message if any, whether it was a cache hit and the elapsed time.
+    """
+    start = time.perf_counter()
+    result = {"agent": agent["name"], "response": None, "error": None, "cached": False}
+    response_cache = get_response_cache()
+    try:
+        context, messages = build_agent_messages(agent, prompt, customer_data, dataset_version, memory)
+        context = cache_context(context, memory)
+        if response_cache is not None:
+            # SQLite and the embedding model block, so they run off the event loop
+            result["response"] = await asyncio.to_thread(
+                response_cache.get, agent["prompt_template"], context, prompt
+            )
+            result["cached"] = result["response"] is not None
+        if result["response"] is None:
+            async with semaphore:
+                response = await chat_model_for_agent(agent).ainvoke(messages)
+            result["response"] = parse_response(response.content)
+            if response_cache is not None:
+                await asyncio.to_thread(
+                    response_cache.put, agent["prompt_template"], context, prompt,
+                    result["response"], agent_cache_ttl(agent)
+                )
+    except Exception as e:
+        result["error"] = str(e)
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+async def fan_out(agents: List[Dict[str, Any]], prompt: str, customer_data: Optional[Dict[str, Any]],
+                  on_result, max_concurrency: int = FANOUT_MAX_CONCURRENCY,
+                  dataset_version: Optional[str] = None,
+                  memories: Optional[Dict[str, ConversationMemory]] = None) -> None:
+    """Send one prompt to several agents at once; ``on_result`` gets each answer as it completes
+
+    ``memories`` maps agent names to their conversation memories.
+    """
+    memories = memories or {}
+    semaphore = asyncio.Semaphore(max_concurrency)
+    tasks = [
+        ainvoke_agent(agent, prompt, customer_data, semaphore, dataset_version, memories.get(agent["name"]))
+        for agent in agents
+    ]
+    for completed in asyncio.as_completed(tasks):
+        on_result(await completed)
+
+
+def _event_loop() -> asyncio.AbstractEventLoop:
+    # One long-lived loop, so async HTTP clients cached in llm_clients never
+    # outlive the loop their pooled connections were opened on
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="agent-runtime", daemon=True).start()
+    return _loop
+
+
+def iter_fan_out(agents: List[Dict[str, Any]], prompt: str, customer_data: Optional[Dict[str, Any]],
+                 max_concurrency: int = FANOUT_MAX_CONCURRENCY,
+                 dataset_version: Optional[str] = None,
+                 memories: Optional[Dict[str, ConversationMemory]] = None) -> Iterator[Dict[str, Any]]:
+    """Blocking view of fan_out for the Streamlit script thread, in completion order"""
+    results: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+    future = asyncio.run_coroutine_threadsafe(
+        fan_out(agents, prompt, customer_data, results.put, max_concurrency, dataset_version, memories),
+        _event_loop()
+    )
+    for _ in agents:
+        yield results.get()
+    future.result()
@@ -0,0 +1,293 @@
+"""Run one agent over every customer in a dataset and write the answers to Parquet.
+
+    python batch_runner.py --agent churn_agent.json --data customers.parquet --output churn_scores/
+
+The agent file holds an agent definition as created in the app (name, type,
+prompt_template, parameters). Answers are written as numbered Parquet parts
+in the output directory; rerunning the same command resumes after the last
+part, skipping customers that already have an answer. A finished run merges
+the parts into one, keeping the latest row per customer.
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import random
+import sys
+import time
+from typing import Any, Dict, List, Optional, Set
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from agent_runtime import build_agent_messages
+from config import (
+    BATCH_CHECKPOINT_ROWS,
+    BATCH_CONCURRENCY,
+    BATCH_MAX_RETRIES,
+    BATCH_REQUESTS_PER_SECOND,
+)
+from ingestion import detect_format, iter_customer_records
+from llm_clients import chat_model_for_agent
+from response_stream import parse_response
+from vector_store import VectorStore, file_fingerprint
+
+DEFAULT_PROMPT = "Assess this customer's churn risk and recommend next actions."
+OUTPUT_SCHEMA = pa.schema([
+    ("customer_id", pa.string()),
+    ("agent", pa.string()),
+    ("response", pa.string()),
+    ("result_json", pa.string()),
+    ("error", pa.string()),
+    ("attempts", pa.int32()),
+    ("latency_seconds", pa.float64()),
+    ("finished_at", pa.float64()),
+])
+
+
+class TokenBucket:
+    """Async token bucket shared by all workers: ``rate`` requests/s, bursts up to ``capacity``"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+def completed_customers(output_dir: str) -> Set[str]:
+    """Customer IDs already answered successfully by earlier (partial) runs"""
+    done = set()
+    for path in sorted(glob.glob(os.path.join(output_dir, "part-*.parquet"))):
+        table = pq.read_table(path, columns=["customer_id", "error"])
+        for customer_id, error in zip(table.column("customer_id").to_pylist(),
+                                      table.column("error").to_pylist()):
+            if error is None:
+                done.add(customer_id)
+    return done
+
+
+def _part_paths(output_dir: str) -> List[str]:
+    return sorted(glob.glob(os.path.join(output_dir, "part-*.parquet")))
+
+
+def _write_table(path: str, table: pa.Table) -> None:
+    # The rename makes the file visible only once complete
+    staging = f"{path}.tmp"
+    pq.write_table(table, staging)
+    os.replace(staging, path)
+
+
+def write_part(output_dir: str, rows: List[Dict[str, Any]]) -> str:
+    """Write a checkpoint part after the highest-numbered existing one"""
+    parts = _part_paths(output_dir)
+    part = int(os.path.basename(parts[-1])[5:10]) + 1 if parts else 0
+    path = os.path.join(output_dir, f"part-{part:05d}.parquet")
+    _write_table(path, pa.Table.from_pylist(rows, schema=OUTPUT_SCHEMA))
+    return path
+
+
+def latest_rows(table: pa.Table) -> pa.Table:
+    """Only the most recently finished row of each customer"""
+    latest: Dict[str, int] = {}
+    finished_at = table.column("finished_at").to_pylist()
+    for position, customer_id in enumerate(table.column("customer_id").to_pylist()):
+        kept = latest.get(customer_id)
+        if kept is None or finished_at[position] >= finished_at[kept]:
+            latest[customer_id] = position
+    return table.take(sorted(latest.values()))
+
+
+def merge_parts(output_dir: str) -> Optional[str]:
+    """Merge all parts into part-00000, dropping rows superseded by a rerun
+
+    Customers that failed and were answered on resume otherwise appear once
+    per attempt across the parts.
+    """
+    parts = _part_paths(output_dir)
+    if not parts:
+        return None
+    table = latest_rows(pa.concat_tables([pq.read_table(path) for path in parts]))
+    # Part 0 is replaced first: if we stop midway, the leftover parts only
+    # hold rows that the next merge drops again
+    _write_table(parts[0], table)
+    for path in parts[1:]:
+        os.remove(path)
+    return parts[0]
+
+
+async def run_customer(agent: Dict[str, Any], chat_model: Any, prompt: str, customer_context: Dict[str, Any],
+                       limiter: TokenBucket, max_retries: int,
+                       dataset_version: Optional[str] = None) -> Dict[str, Any]:
+    """Answer for one customer, retrying failures with exponential backoff and jitter"""
+    customer_id = str(customer_context["customer"]["customer_id"])
+    start = time.perf_counter()
+    try:
+        _, messages = build_agent_messages(agent, prompt, customer_context, dataset_version)
+    except Exception as e:
+        # Not worth retrying: the same input would fail the same way
+        return {
+            "customer_id": customer_id,
+            "agent": agent["name"],
+            "response": None,
+            "result_json": None,
+            "error": f"{type(e).__name__}: {e}",
+            "attempts": 0,
+            "latency_seconds": time.perf_counter() - start,
+            "finished_at": time.time(),
+        }
+    error = None
+    for attempt in range(1, max_retries + 2):
+        await limiter.acquire()
+        try:
+            response = await chat_model.ainvoke(messages)
+            result = parse_response(response.content)
+            answer = result.get("response")
+            return {
+                "customer_id": customer_id,
+                "agent": agent["name"],
+                "response": answer if isinstance(answer, str) else json.dumps(answer),
+                "result_json": json.dumps(result),
+                "error": None,
+                "attempts": attempt,
+                "latency_seconds": time.perf_counter() - start,
+                "finished_at": time.time(),
+            }
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if attempt <= max_retries:
+                await asyncio.sleep(min(60.0, 2 ** (attempt - 1)) * (0.5 + random.random()))
+    return {
+        "customer_id": customer_id,
+        "agent": agent["name"],
+        "response": None,
+        "result_json": None,
+        "error": error,
+        "attempts": max_retries + 1,
+        "latency_seconds": time.perf_counter() - start,
+        "finished_at": time.time(),
+    }
+
+
+async def run_batch(agent: Dict[str, Any], data_path: str, output_dir: str, prompt: str = DEFAULT_PROMPT,
+                    concurrency: int = BATCH_CONCURRENCY, rate: float = BATCH_REQUESTS_PER_SECOND,
+                    max_retries: int = BATCH_MAX_RETRIES,
+                    checkpoint_rows: int = BATCH_CHECKPOINT_ROWS) -> Dict[str, Any]:
+    """Apply ``agent`` to every customer in ``data_path``; returns run statistics"""
+    os.makedirs(output_dir, exist_ok=True)
+    done = completed_customers(output_dir)
+
+    # Similar-customer context comes from the app's snapshot of this dataset, if it has one
+    vector_store = VectorStore.load_snapshot(file_fingerprint(data_path))
+    dataset_version = vector_store.fingerprint if vector_store is not None else None
+
+    # Built once, before any task starts, so a missing API key fails the run right away
+    chat_model = chat_model_for_agent(agent)
+    limiter = TokenBucket(rate)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=2 * concurrency)
+    pending_rows: List[Dict[str, Any]] = []
+    stats = {"processed": 0, "failed": 0, "skipped": 0, "invalid": 0}
+    start = time.perf_counter()
+
+    def report() -> None:
+        minutes = (time.perf_counter() - start) / 60
+        rate_per_minute = stats["processed"] / minutes if minutes else 0.0
+        print(
+            f"{stats['processed']:,} customers ({stats['failed']:,} failed, {stats['skipped']:,} resumed) "
+            f"- {rate_per_minute:,.1f} customers/min",
+            file=sys.stderr
+        )
+
+    async def worker() -> None:
+        while True:
+            customer_context = await queue.get()
+            if customer_context is None:
+                return
+            row = await run_customer(agent, chat_model, prompt, customer_context, limiter, max_retries,
+                                     dataset_version)
+            pending_rows.append(row)
+            stats["processed"] += 1
+            stats["failed"] += row["error"] is not None
+            if len(pending_rows) >= checkpoint_rows:
+                write_part(output_dir, pending_rows[:])
+                pending_rows.clear()
+                report()
+
+    def customer_contexts(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        contexts = []
+        for record in records:
+            context = vector_store.get_customer_context(record["customer_id"]) if vector_store else None
+            contexts.append(context or {"customer": record, "similar_patterns": []})
+        return contexts
+
+    async def producer() -> None:
+        # Reading the file and looking up similar customers block, so they run off the event loop
+        batches = iter_customer_records(data_path, detect_format(data_path))
+        while True:
+            batch = await asyncio.to_thread(next, batches, None)
+            if batch is None:
+                break
+            records, errors = batch
+            stats["invalid"] += len(errors)
+            todo = [record for record in records if str(record["customer_id"]) not in done]
+            stats["skipped"] += len(records) - len(todo)
+            for context in await asyncio.to_thread(customer_contexts, todo):
+                await queue.put(context)
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    # A failing task cancels the others instead of leaving the producer blocked on a full queue
+    async with asyncio.TaskGroup() as tasks:
+        tasks.create_task(producer())
+        for _ in range(concurrency):
+            tasks.create_task(worker())
+
+    if pending_rows:
+        write_part(output_dir, pending_rows)
+    merge_parts(output_dir)
+    report()
+    stats["seconds"] = time.perf_counter() - start
+    stats["customers_per_minute"] = 60 * stats["processed"] / stats["seconds"] if stats["seconds"] else 0.0
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--agent", required=True, help="JSON file with the agent definition")
+    parser.add_argument("--data", required=True, help="customer CSV, Parquet, Feather/Arrow or JSON Lines file")
+    parser.add_argument("--output", required=True, help="output directory for Parquet parts")
+    parser.add_argument("--prompt", default=DEFAULT_PROMPT)
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY)
+    parser.add_argument("--rate", type=float, default=BATCH_REQUESTS_PER_SECOND, help="requests per second")
+    parser.add_argument("--max-retries", type=int, default=BATCH_MAX_RETRIES)
+    parser.add_argument("--checkpoint-rows", type=int, default=BATCH_CHECKPOINT_ROWS)
+    args = parser.parse_args()
+
+    with open(args.agent, encoding="utf-8") as f:
+        agent = json.load(f)
+    agent.setdefault("name", os.path.splitext(os.path.basename(args.agent))[0])
+    agent.setdefault("type", "Churn Prevention Agent")
+    agent.setdefault("parameters", {})
+
+    stats = asyncio.run(run_batch(
+        agent, args.data, args.output, prompt=args.prompt, concurrency=args.concurrency,
+        rate=args.rate, max_retries=args.max_retries, checkpoint_rows=args.checkpoint_rows
+    ))
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Compare the legacy iterrows CSV loop with the app's streaming ingestion path,
+decoding in-process and on the decode process pool.
+
+    python benchmarks/ingest_benchmark.py --rows 100000 1000000
+"""
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ingestion import get_decode_pool, iter_customer_records  # noqa: E402
+
+
+def make_csv(n_rows: int, seed: int = 0) -> bytes:
+    rng = random.Random(seed)
+    channels = ["email", "phone", "chat", "store"]
+    products = [f"SKU-{i:04d}" for i in range(500)]
+    frame = pd.DataFrame({
+        "customer_id": [f"C{i:07d}" for i in range(n_rows)],
+        "interaction_history": [
+            json.dumps([
+                {"date": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                 "channel": rng.choice(channels)}
+                for _ in range(rng.randint(0, 5))
+            ])
+            for _ in range(n_rows)
+        ],
+        "purchase_history": [
+            json.dumps([
+                {"product": rng.choice(products), "amount": round(rng.uniform(5, 500), 2)}
+                for _ in range(rng.randint(0, 5))
+            ])
+            for _ in range(n_rows)
+        ],
+    })
+    return frame.to_csv(index=False).encode("utf-8")
+
+
+def legacy_process(data: bytes):
+    """The original pd.read_csv + iterrows loop from process_customer_data"""
+    df = pd.read_csv(io.BytesIO(data))
+    processed_data = []
+    for _, row in df.iterrows():
+        processed_data.append({
+            "customer_id": row["customer_id"],
+            "interaction_history": json.loads(row["interaction_history"])
+                if isinstance(row["interaction_history"], str) else row["interaction_history"],
+            "purchase_history": json.loads(row["purchase_history"])
+                if isinstance(row["purchase_history"], str) else row["purchase_history"]
+        })
+    return processed_data
+
+
+def stream_process(data: bytes, pool=None):
+    """Records as uploads produce them: iter_customer_records over CSV blocks"""
+    records = []
+    for batch_records, _ in iter_customer_records(io.BytesIO(data), "csv", pool=pool):
+        records.extend(batch_records)
+    return records
+
+
+def timed(fn, data: bytes):
+    start = time.perf_counter()
+    result = fn(data)
+    return time.perf_counter() - start, len(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    args = parser.parse_args()
+
+    pool = get_decode_pool()
+    for n_rows in args.rows:
+        data = make_csv(n_rows)
+        legacy_seconds, legacy_count = timed(legacy_process, data)
+        stream_seconds, stream_count = timed(stream_process, data)
+        line = (
+            f"{n_rows:>9,} rows  {len(data) / 1e6:8.1f} MB  "
+            f"iterrows {legacy_seconds:7.2f}s  streamed {stream_seconds:7.2f}s "
+            f"({legacy_seconds / stream_seconds:5.1f}x)"
+        )
+        assert legacy_count == stream_count == n_rows
+        if pool is not None:
+            pool_seconds, pool_count = timed(lambda d: stream_process(d, pool), data)
+            assert pool_count == n_rows
+            line += f"  decode pool {pool_seconds:7.2f}s ({legacy_seconds / pool_seconds:5.1f}x)"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,13 @@
 import streamlit as st
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 import json
+from itertools import chain
+from agent_runtime import build_agent_messages, cache_context, iter_fan_out, response_text
+from config import CHAT_PAGE_SIZE
+from conversation_memory import ConversationMemory
 from data_processor import get_customer_data, render_data_upload
-from langchain_community.chat_models import ChatPerplexity
+from llm_clients import chat_model_for_agent
+from response_cache import agent_cache_ttl, get_response_cache
+from response_stream import ResponseFieldParser, parse_response, stream_response_field
 import os
 
 def render_chat_page():
@@ -27,8 +31,20 @@ def render_chat_page():
             st.rerun()
         return
 
-    selected_agent_name = st.selectbox("Select Agent", [agent["name"] for agent in st.session_state.agents])
-    selected_agent = next(agent for agent in st.session_state.agents if agent["name"] == selected_agent_name)
+    agent_names = [agent["name"] for agent in st.session_state.agents]
+    fan_out_mode = st.toggle(
+        "Ask several agents at once",
+        help="Send each message to all selected agents concurrently and compare their answers"
+    )
+    if fan_out_mode:
+        selected_names = st.multiselect("Select Agents", agent_names, default=agent_names[:2])
+        selected_agents = [agent for agent in st.session_state.agents if agent["name"] in selected_names]
+        if not selected_agents:
+            st.info("Select at least one agent.")
+            return
+    else:
+        selected_agent_name = st.selectbox("Select Agent", agent_names)
+        selected_agent = next(agent for agent in st.session_state.agents if agent["name"] == selected_agent_name)
 
     # Customer Context
     customer_id = st.text_input("Enter Customer ID", help="Enter the ID of the customer you want to analyze")
@@ -37,40 +53,35 @@ def render_chat_page():
     if customer_id and not customer_data:
         st.warning("Customer not found. Please check the ID or upload customer data.")
 
-    # Initialize chat model based on agent type
-    if selected_agent["type"] == "Research Agent":
+    # Cached chat client for the agent type, reused across reruns
+    if not fan_out_mode:
         try:
-            chat_model = ChatPerplexity(
-                api_key=os.environ["PPLX_API_KEY"],
-                temperature=0.7,
-                model="sonar"  # Updated model name
-            )
+            chat_model = chat_model_for_agent(selected_agent)
         except Exception as e:
-            st.error(f"Error initializing Perplexity chat model: {str(e)}")
+            st.error(f"Error initializing chat model: {str(e)}")
             return
-    else:
-        chat_model = ChatOpenAI(
-            model="gpt-4",
-            temperature=0.7,
-            response_format={"type": "json_object"}
-        )
 
     # Chat interface
     if "messages" not in st.session_state:
         st.session_state.messages = []
-
-    # Display chat history
-    for message in st.session_state.messages:
+    if "memories" not in st.session_state:
+        st.session_state.memories = {}
+    if "history_pages" not in st.session_state:
+        st.session_state.history_pages = 1
+    _migrate_messages()
+
+    # Display chat history: only the latest pages, each message already rendered to markdown
+    visible = CHAT_PAGE_SIZE * st.session_state.history_pages
+    hidden = len(st.session_state.messages) - visible
+    if hidden > 0:
+        if st.button(f"Show earlier messages ({hidden} hidden)"):
+            st.session_state.history_pages += 1
+            st.rerun()
+    for message in st.session_state.messages[-visible:]:
         with st.chat_message(message["role"]):
-            if message["role"] == "assistant":
-                try:
-                    # Parse JSON response for better formatting
-                    content = json.loads(message["content"])
-                    st.markdown(content.get("response", message["content"]))
-                except json.JSONDecodeError:
-                    st.markdown(message["content"])
-            else:
-                st.markdown(message["content"])
+            if message.get("agent"):
+                st.caption(message["agent"])
+            st.markdown(message["content"])
 
     # Chat input
     if prompt := st.chat_input("Enter your message"):
@@ -79,42 +90,118 @@ def render_chat_page():
         with st.chat_message("user"):
             st.markdown(prompt)
 
-        # Generate agent response
-        with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                # Prepare context for the agent
-                context = {
-                    "agent_type": selected_agent["type"],
-                    "parameters": selected_agent["parameters"],
-                    "customer_data": customer_data
-                }
-
-                # Generate response using the agent's prompt template
-                messages = [
-                    SystemMessage(content=selected_agent["prompt_template"]),
-                    HumanMessage(content=json.dumps({
-                        "user_message": prompt,
-                        "context": context
-                    }))
-                ]
-
-                response = chat_model.invoke(messages)
-
-                try:
-                    # Ensure response is properly formatted JSON
-                    response_content = json.loads(response.content)
-                    if isinstance(response_content, str):
-                        response_content = {"response": response_content}
-                except json.JSONDecodeError:
-                    response_content = {"response": response.content}
-
-                # Display response
-                st.markdown(response_content.get("response", response.content))
-                st.session_state.messages.append(
-                    {"role": "assistant", "content": json.dumps(response_content)}
-                )
+        # Fitted customer contexts are cached per dataset snapshot
+        dataset_version = st.session_state.vector_store.fingerprint
+        if fan_out_mode:
+            _render_fan_out(selected_agents, prompt, customer_data, dataset_version)
+        else:
+            _render_single_agent(selected_agent, chat_model, prompt, customer_data, dataset_version)
 
     # Clear chat button
     if st.button("Clear Chat"):
         st.session_state.messages = []
-        st.rerun()
\ No newline at end of file
+        st.session_state.memories = {}
+        st.session_state.history_pages = 1
+        st.rerun()
+
+    response_cache = get_response_cache()
+    if response_cache is not None:
+        stats = response_cache.stats()
+        st.caption(
+            f"Response cache: {stats['hit_rate']:.0%} hit rate "
+            f"({stats['exact_hits']} exact, {stats['semantic_hits']} semantic, {stats['misses']} misses)"
+        )
+
+def _assistant_message(response_content, agent_name=None):
+    """Chat history entry keeping the parsed response and its display text"""
+    message = {
+        "role": "assistant",
+        "content": response_text(response_content),
+        "response": response_content
+    }
+    if agent_name:
+        message["agent"] = agent_name
+    return message
+
+def _migrate_messages():
+    """Convert history stored as JSON strings (older sessions) to parsed messages, once"""
+    if st.session_state.get("messages_version") == 2:
+        return
+    for index, message in enumerate(st.session_state.messages):
+        if message["role"] == "assistant" and "response" not in message:
+            st.session_state.messages[index] = _assistant_message(
+                parse_response(message["content"]), message.get("agent")
+            )
+    st.session_state.messages_version = 2
+
+def _agent_memory(agent):
+    """The conversation memory of an agent in this session"""
+    return st.session_state.memories.setdefault(agent["name"], ConversationMemory())
+
+def _render_single_agent(selected_agent, chat_model, prompt, customer_data, dataset_version=None):
+    """Stream one agent's answer to the prompt"""
+    # Generate agent response
+    with st.chat_message("assistant"):
+        # Prepare context and messages from the agent's prompt template
+        memory = _agent_memory(selected_agent)
+        context, messages = build_agent_messages(
+            selected_agent, prompt, customer_data, dataset_version, memory
+        )
+        context = cache_context(context, memory)
+
+        # Repeated (or near-identical) questions are answered from the response cache
+        response_cache = get_response_cache()
+        response_content = None
+        if response_cache is not None:
+            response_content = response_cache.get(selected_agent["prompt_template"], context, prompt)
+
+        if response_content is not None:
+            st.markdown(response_content.get("response", json.dumps(response_content)))
+            st.caption("Served from the response cache")
+        else:
+            # Stream the "response" field as tokens arrive; the spinner stays up until the first one
+            parser = ResponseFieldParser()
+            visible = stream_response_field(
+                (chunk.content for chunk in chat_model.stream(messages)), parser
+            )
+            with st.spinner("Thinking..."):
+                first = next(visible, "")
+            streamed = st.write_stream(chain([first], visible)) if first else ""
+
+            response_content = parse_response(parser.buffer)
+
+            # Display response when it could not be streamed (e.g. no string "response" field)
+            if not streamed:
+                st.markdown(response_content.get("response", parser.buffer))
+            if response_cache is not None:
+                response_cache.put(
+                    selected_agent["prompt_template"], context, prompt, response_content,
+                    ttl=agent_cache_ttl(selected_agent)
+                )
+
+        memory.add_turn(prompt, response_text(response_content))
+        st.session_state.messages.append(_assistant_message(response_content))
+
+def _render_fan_out(selected_agents, prompt, customer_data, dataset_version=None):
+    """Answer the prompt with several agents concurrently, side by side as each completes"""
+    with st.chat_message("assistant"):
+        slots = {}
+        for column, agent in zip(st.columns(len(selected_agents)), selected_agents):
+            with column:
+                st.markdown(f"**{agent['name']}**")
+                slots[agent["name"]] = st.empty()
+                slots[agent["name"]].caption("Thinking...")
+
+        memories = {agent["name"]: _agent_memory(agent) for agent in selected_agents}
+        for result in iter_fan_out(
+            selected_agents, prompt, customer_data, dataset_version=dataset_version, memories=memories
+        ):
+            with slots[result["agent"]].container():
+                if result["error"]:
+                    st.error(f"Error: {result['error']}")
+                    continue
+                response_content = result["response"]
+                st.markdown(response_content.get("response", json.dumps(response_content)))
+                st.caption("cached" if result["cached"] else f"{result['seconds']:.1f}s")
+            memories[result["agent"]].add_turn(prompt, response_text(response_content))
+            st.session_state.messages.append(_assistant_message(response_content, result["agent"]))
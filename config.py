@@ -1 +1,100 @@
- 
\ No newline at end of file
+import json
+import os
+
+# Embedding model shared by every session in the process
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2")
+EMBEDDING_DEVICE = os.getenv("EMBEDDING_DEVICE") or None
+
+# On-disk vector store snapshots, keyed by dataset fingerprint
+VECTOR_STORE_DIR = os.getenv("VECTOR_STORE_DIR", os.path.join(".cache", "vector_store"))
+
+# FAISS index backend: auto, flat, ivf_flat, hnsw or ivf_pq
+VECTOR_INDEX_MODE = os.getenv("VECTOR_INDEX_MODE", "auto")
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "16"))
+HNSW_M = int(os.getenv("HNSW_M", "32"))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "64"))
+# Corpus sizes at which "auto" switches to IVF-Flat and then IVF-PQ
+AUTO_IVF_MIN_ROWS = int(os.getenv("AUTO_IVF_MIN_ROWS", "50000"))
+AUTO_IVFPQ_MIN_ROWS = int(os.getenv("AUTO_IVFPQ_MIN_ROWS", "1000000"))
+
+# Ingest embeds in batches of this many rows; >1 workers use a CPU process pool
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "2048"))
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "0"))
+# Bulk (ingest) encodes hold the model for this many rows at a time, so queries can cut in
+EMBED_YIELD_ROWS = int(os.getenv("EMBED_YIELD_ROWS", "64"))
+
+# On-disk embedding cache keyed by text and model; empty path disables it
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", os.path.join(".cache", "embeddings.sqlite"))
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "2000000"))
+
+# Neighbours kept per customer by VectorStore.precompute_neighbours
+NEIGHBOUR_K = int(os.getenv("NEIGHBOUR_K", "10"))
+PRECOMPUTE_NEIGHBOURS = os.getenv("PRECOMPUTE_NEIGHBOURS", "1") == "1"
+
+# Customer table bytes are compacted once this share of them is left over from updates/removals
+TABLE_COMPACT_DEAD_FRACTION = float(os.getenv("TABLE_COMPACT_DEAD_FRACTION", "0.3"))
+# Precision of stored vectors and index codes: float32, float16 or int8
+VECTOR_DTYPE = os.getenv("VECTOR_DTYPE", "float32")
+# Filtered searches matching at most this many rows are scored exactly
+FILTER_EXACT_MAX_ROWS = int(os.getenv("FILTER_EXACT_MAX_ROWS", "20000"))
+
+# Hybrid search: reciprocal rank fusion constant, and how far the best BM25 hit
+# must outscore the runner-up for lexical results to skip dense search
+HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))
+LEXICAL_SHORT_CIRCUIT_RATIO = float(os.getenv("LEXICAL_SHORT_CIRCUIT_RATIO", "3.0"))
+
+# Uploads are parsed, validated and embedded one block of this many bytes at a time
+INGEST_BLOCK_BYTES = int(os.getenv("INGEST_BLOCK_BYTES", str(16 << 20)))
+# Rows kept from an upload for the preview table
+PREVIEW_ROWS = int(os.getenv("PREVIEW_ROWS", "5"))
+# Processes decoding and validating uploaded blocks in parallel (1 = in-process)
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+# Quarantined rows kept for the error report (all of them are counted)
+MAX_REPORTED_ERRORS = int(os.getenv("MAX_REPORTED_ERRORS", "1000"))
+# Rows per batch for columnar uploads (Parquet, Arrow/Feather, JSON Lines)
+INGEST_BATCH_ROWS = int(os.getenv("INGEST_BATCH_ROWS", "65536"))
+# Background ingestion jobs: concurrent jobs, and how long finished ones stay pollable
+INGEST_JOB_WORKERS = int(os.getenv("INGEST_JOB_WORKERS", "2"))
+INGEST_JOB_RETENTION_SECONDS = float(os.getenv("INGEST_JOB_RETENTION_SECONDS", "600"))
+# Seconds between progress refreshes while an ingestion job runs
+INGEST_POLL_SECONDS = float(os.getenv("INGEST_POLL_SECONDS", "1.0"))
+# Dataset profile: customers sampled for similarity/cluster stats, k-means clusters, top products shown
+PROFILE_SAMPLE_SIZE = int(os.getenv("PROFILE_SAMPLE_SIZE", "20000"))
+PROFILE_CLUSTERS = int(os.getenv("PROFILE_CLUSTERS", "8"))
+PROFILE_TOP_PRODUCTS = int(os.getenv("PROFILE_TOP_PRODUCTS", "10"))
+# Pooled HTTP connections shared by the cached chat model clients
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "10"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "120"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+# Agent response cache: SQLite path (empty disables), size bound, semantic match
+# threshold (cosine), and answer TTLs in seconds, per agent type with a default
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", os.path.join(".cache", "responses.sqlite"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "10000"))
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.95"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "86400"))
+# Research agents answer about current events, so their answers go stale sooner
+RESPONSE_CACHE_TTLS = json.loads(os.getenv("RESPONSE_CACHE_TTLS", '{"Research Agent": 3600}'))
+# Agents answering one fan-out prompt concurrently
+FANOUT_MAX_CONCURRENCY = int(os.getenv("FANOUT_MAX_CONCURRENCY", "4"))
+# Offline batch runner: concurrent requests, shared request rate, retries and rows per checkpoint part
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+BATCH_REQUESTS_PER_SECOND = float(os.getenv("BATCH_REQUESTS_PER_SECOND", "2"))
+BATCH_MAX_RETRIES = int(os.getenv("BATCH_MAX_RETRIES", "4"))
+BATCH_CHECKPOINT_ROWS = int(os.getenv("BATCH_CHECKPOINT_ROWS", "500"))
+# Token budget for the customer context sent with each message, per agent type with a default,
+# and how many fitted contexts are cached
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2000"))
+CONTEXT_TOKEN_BUDGETS = json.loads(os.getenv("CONTEXT_TOKEN_BUDGETS", "{}"))
+CONTEXT_CACHE_SIZE = int(os.getenv("CONTEXT_CACHE_SIZE", "1024"))
+# Conversation memory: turns sent verbatim, turns folded into the running summary at once,
+# the model writing the summary and its length
+MEMORY_RECENT_TURNS = int(os.getenv("MEMORY_RECENT_TURNS", "4"))
+MEMORY_SUMMARY_EVERY = int(os.getenv("MEMORY_SUMMARY_EVERY", "4"))
+MEMORY_SUMMARY_PROVIDER = os.getenv("MEMORY_SUMMARY_PROVIDER", "openai")
+MEMORY_SUMMARY_MODEL = os.getenv("MEMORY_SUMMARY_MODEL", "gpt-4o-mini")
+MEMORY_SUMMARY_WORDS = int(os.getenv("MEMORY_SUMMARY_WORDS", "200"))
+# Chat messages shown per history page; older ones load on demand
+CHAT_PAGE_SIZE = int(os.getenv("CHAT_PAGE_SIZE", "20"))
@@ -0,0 +1,154 @@
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from config import CONTEXT_CACHE_SIZE, CONTEXT_TOKEN_BUDGET, CONTEXT_TOKEN_BUDGETS
+from customer_attributes import derive_attributes, entry_timestamp
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken is optional (and needs its vocabulary file); fall back to ~4 chars/token
+    _encoding = None
+
+# Values kept per list in compact customer summaries
+COMPACT_LIST_LIMIT = 5
+
+_cache: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def count_tokens(text: str) -> int:
+    """Prompt tokens of a text (cl100k_base when tiktoken is installed, else an estimate)"""
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+def agent_token_budget(agent: Dict[str, Any]) -> int:
+    """Context tokens an agent may use: its own setting, else its type's, else the default"""
+    if "context_budget" in agent:
+        return int(agent["context_budget"])
+    return int(CONTEXT_TOKEN_BUDGETS.get(agent["type"], CONTEXT_TOKEN_BUDGET))
+
+
+def recent_first(history: Any) -> List[Any]:
+    """History entries newest first; undated entries are assumed to be in file order"""
+    entries = list(reversed(history if isinstance(history, list) else [history] if history else []))
+    stamps = [entry_timestamp(entry) if isinstance(entry, dict) else None for entry in entries]
+    order = sorted(
+        range(len(entries)),
+        key=lambda i: float("-inf") if stamps[i] is None else stamps[i],
+        reverse=True
+    )
+    return [entries[i] for i in order]
+
+
+def _date(timestamp: float) -> Optional[str]:
+    if timestamp != timestamp:  # NaN: no dated entries
+        return None
+    try:
+        return datetime.fromtimestamp(timestamp, tz=timezone.utc).date().isoformat()
+    except (ValueError, OverflowError, OSError):
+        return None
+
+
+def compact_customer(customer: Dict[str, Any]) -> Dict[str, Any]:
+    """Salient fields of a customer instead of its full histories"""
+    attributes = derive_attributes(customer)
+    return {
+        "customer_id": customer["customer_id"],
+        "segment": attributes["segment"],
+        "n_purchases": attributes["n_purchases"],
+        "n_interactions": attributes["n_interactions"],
+        "total_spend": round(attributes["total_spend"], 2),
+        "last_purchase": _date(attributes["last_purchase_at"]),
+        "last_interaction": _date(attributes["last_interaction_at"]),
+        "top_products": sorted(attributes["products"])[:COMPACT_LIST_LIMIT],
+        "channels": sorted(attributes["channels"])[:COMPACT_LIST_LIMIT],
+    }
+
+
+def fit_customer_context(customer_data: Dict[str, Any], budget: int) -> Dict[str, Any]:
+    """Shrink a customer context to at most ``budget`` tokens of JSON
+
+    Similar customers are always compacted. The customer's own histories are
+    kept newest first and cut to the longest prefix that fits, with a summary
+    of the full histories and the number of omitted entries. If even that
+    does not fit, similar customers are dropped from the least similar end.
+    """
+    customer = customer_data["customer"]
+    similar = [compact_customer(other) for other in customer_data.get("similar_patterns", [])]
+    interactions = recent_first(customer.get("interaction_history"))
+    purchases = recent_first(customer.get("purchase_history"))
+    summary = None
+
+    def build(n_entries: int, similar_patterns: List[Dict[str, Any]]) -> Dict[str, Any]:
+        nonlocal summary
+        record = {
+            "customer_id": customer["customer_id"],
+            "interaction_history": interactions[:n_entries],
+            "purchase_history": purchases[:n_entries],
+        }
+        omitted = {
+            "interaction_history": max(0, len(interactions) - n_entries),
+            "purchase_history": max(0, len(purchases) - n_entries),
+        }
+        if any(omitted.values()):
+            if summary is None:
+                summary = compact_customer(customer)
+            record["omitted_entries"] = omitted
+            record["summary"] = summary
+        return {"customer": record, "similar_patterns": similar_patterns}
+
+    def fits(context: Dict[str, Any]) -> bool:
+        return count_tokens(json.dumps(context)) <= budget
+
+    longest = max(len(interactions), len(purchases))
+    context = build(longest, similar)
+    if fits(context):
+        return context
+
+    # Longest history prefix that fits
+    low, high = 0, longest - 1
+    while low < high:
+        middle = (low + high + 1) // 2
+        if fits(build(middle, similar)):
+            low = middle
+        else:
+            high = middle - 1
+    context = build(low, similar)
+    while similar and not fits(context):
+        similar = similar[:-1]
+        context = build(0, similar)
+    return context
+
+
+def build_agent_context(customer_data: Optional[Dict[str, Any]], agent: Dict[str, Any],
+                        dataset_version: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Customer context fitted to the agent's token budget
+
+    Results are cached per dataset version, customer and budget; without a
+    ``dataset_version`` (e.g. an unsaved store) nothing is cached.
+    """
+    if customer_data is None:
+        return None
+    budget = agent_token_budget(agent)
+    key = None
+    if dataset_version is not None:
+        key = (dataset_version, str(customer_data["customer"]["customer_id"]), budget)
+        with _cache_lock:
+            context = _cache.get(key)
+            if context is not None:
+                _cache.move_to_end(key)
+                return context
+
+    context = fit_customer_context(customer_data, budget)
+    if key is not None:
+        with _cache_lock:
+            _cache[key] = context
+            while len(_cache) > CONTEXT_CACHE_SIZE:
+                _cache.popitem(last=False)
+    return context
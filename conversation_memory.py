@@ -0,0 +1,101 @@
+import hashlib
+import json
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+from config import (
+    MEMORY_RECENT_TURNS,
+    MEMORY_SUMMARY_EVERY,
+    MEMORY_SUMMARY_MODEL,
+    MEMORY_SUMMARY_PROVIDER,
+    MEMORY_SUMMARY_WORDS,
+)
+from llm_clients import get_chat_model
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a conversation between an analyst and an AI agent. "
+    "Update the summary with the new turns, keeping facts, decisions, customer details and "
+    "open questions. Reply with the updated summary only, in at most {words} words."
+)
+
+_summarizer = ThreadPoolExecutor(max_workers=2, thread_name_prefix="memory-summary")
+
+
+class ConversationMemory:
+    """Agent memory of bounded size: a running summary plus the last few turns
+
+    Every turn is recorded; prompts carry the summary and, verbatim, every
+    turn it does not cover yet. Once ``summary_every`` turns have fallen out
+    of the last ``recent_turns`` they are folded into the summary on a
+    background thread, so the chat turn never waits for it. Prompts thus
+    hold at most about ``recent_turns + summary_every`` turns.
+    """
+
+    def __init__(self, recent_turns: int = MEMORY_RECENT_TURNS, summary_every: int = MEMORY_SUMMARY_EVERY):
+        self.recent_turns = recent_turns
+        self.summary_every = summary_every
+        self.summary = ""
+        self._turns: List[Tuple[str, str]] = []
+        self._summarized = 0
+        self._pending: Optional[Future] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._turns)
+
+    def add_turn(self, user_message: str, assistant_message: str) -> None:
+        with self._lock:
+            self._turns.append((user_message, assistant_message))
+            self._maybe_summarize()
+
+    def messages(self) -> List[BaseMessage]:
+        """Summary and unsummarized turns as chat messages, to go before the new message"""
+        with self._lock:
+            summary = self.summary
+            recent = self._turns[self._summarized:]
+        messages: List[BaseMessage] = []
+        if summary:
+            messages.append(SystemMessage(content=f"Summary of the earlier conversation: {summary}"))
+        for user_message, assistant_message in recent:
+            messages.append(HumanMessage(content=user_message))
+            messages.append(AIMessage(content=assistant_message))
+        return messages
+
+    def cache_scope(self) -> Optional[str]:
+        """Hash of what the prompt remembers, or None for a fresh conversation"""
+        with self._lock:
+            if not self._turns:
+                return None
+            state = [self.summary, self._turns[self._summarized:]]
+        return hashlib.sha256(json.dumps(state).encode("utf-8")).hexdigest()
+
+    def _maybe_summarize(self) -> None:
+        # Called with the lock held
+        unsummarized_end = len(self._turns) - self.recent_turns
+        if self._pending is not None or unsummarized_end - self._summarized < self.summary_every:
+            return
+        turns = self._turns[self._summarized:unsummarized_end]
+        self._pending = _summarizer.submit(self._summarize, self.summary, turns, unsummarized_end)
+
+    def _summarize(self, summary: str, turns: List[Tuple[str, str]], upto: int) -> None:
+        transcript = "\n".join(f"Analyst: {user}\nAgent: {assistant}" for user, assistant in turns)
+        try:
+            chat_model = get_chat_model(MEMORY_SUMMARY_PROVIDER, MEMORY_SUMMARY_MODEL, temperature=0.0)
+            response = chat_model.invoke([
+                SystemMessage(content=SUMMARY_PROMPT.format(words=MEMORY_SUMMARY_WORDS)),
+                HumanMessage(content=f"Current summary:\n{summary or '(none)'}\n\nNew turns:\n{transcript}"),
+            ])
+            new_summary = response.content.strip()
+        except Exception:
+            # Keep the old summary; these turns are retried with the next batch
+            new_summary = None
+        with self._lock:
+            if new_summary is not None:
+                self.summary = new_summary
+                self._summarized = upto
+            self._pending = None
+            if new_summary is not None:
+                self._maybe_summarize()
@@ -0,0 +1,254 @@
+import heapq
+import json
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+# Keys probed inside history entries; the CSV schema leaves them free-form
+DATE_KEYS = ("date", "timestamp", "purchase_date", "created_at", "time")
+AMOUNT_KEYS = ("amount", "price", "total", "value")
+PRODUCT_KEYS = ("product", "product_name", "product_id", "sku", "item")
+CHANNEL_KEYS = ("channel", "type", "interaction_type")
+SEGMENT_KEYS = ("segment", "customer_segment", "tier")
+# Numeric dates above this are epoch milliseconds (as seconds it would be the year 5138)
+EPOCH_MILLISECONDS_ABOVE = 1e11
+
+NUMERIC_ATTRIBUTES = (
+    "n_purchases",
+    "n_interactions",
+    "total_spend",
+    "last_purchase_at",
+    "last_interaction_at",
+)
+SINGLE_VALUED_ATTRIBUTES = ("segment",)
+MULTI_VALUED_ATTRIBUTES = ("products", "channels")
+# Recency filters are evaluated against the stored timestamps at query time
+RECENCY_ATTRIBUTES = {
+    "days_since_last_purchase": "last_purchase_at",
+    "days_since_last_interaction": "last_interaction_at",
+}
+
+_COMPARISONS = {
+    "<": np.less,
+    "<=": np.less_equal,
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "==": np.equal,
+    "!=": np.not_equal,
+}
+
+
+def _entries(history: Any) -> List[Dict[str, Any]]:
+    if isinstance(history, dict):
+        return [history]
+    if isinstance(history, list):
+        return [entry for entry in history if isinstance(entry, dict)]
+    return []
+
+
+def _first(entry: Dict[str, Any], keys: Iterable[str]) -> Any:
+    for key in keys:
+        if entry.get(key) not in (None, ""):
+            return entry[key]
+    return None
+
+
+def _timestamp(value: Any) -> Optional[float]:
+    if isinstance(value, (int, float)):
+        return value / 1000.0 if abs(value) > EPOCH_MILLISECONDS_ABOVE else float(value)
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+        except ValueError:
+            return None
+    return None
+
+
+def entry_timestamp(entry: Dict[str, Any]) -> Optional[float]:
+    """Timestamp of a history entry, or None when it has no parseable date"""
+    return _timestamp(_first(entry, DATE_KEYS))
+
+
+def _latest(entries: List[Dict[str, Any]]) -> float:
+    stamps = [entry_timestamp(entry) for entry in entries]
+    stamps = [stamp for stamp in stamps if stamp is not None]
+    return max(stamps) if stamps else np.nan
+
+
+def derive_attributes(customer: Dict[str, Any]) -> Dict[str, Any]:
+    """Filterable attributes derived from a customer's histories"""
+    purchases = _entries(customer.get("purchase_history"))
+    interactions = _entries(customer.get("interaction_history"))
+
+    total_spend = 0.0
+    for purchase in purchases:
+        amount = _first(purchase, AMOUNT_KEYS)
+        try:
+            total_spend += float(amount)
+        except (TypeError, ValueError):
+            pass
+
+    segment = customer.get("segment")
+    if segment is None:
+        segment = next(
+            (_first(entry, SEGMENT_KEYS) for entry in interactions + purchases
+             if _first(entry, SEGMENT_KEYS) is not None),
+            None
+        )
+
+    return {
+        "n_purchases": len(purchases),
+        "n_interactions": len(interactions),
+        "total_spend": total_spend,
+        "last_purchase_at": _latest(purchases),
+        "last_interaction_at": _latest(interactions),
+        "segment": None if segment is None else str(segment),
+        "products": {str(p) for p in (_first(e, PRODUCT_KEYS) for e in purchases) if p is not None},
+        "channels": {str(c) for c in (_first(e, CHANNEL_KEYS) for e in interactions) if c is not None},
+    }
+
+
+class AttributeIndex:
+    """Per-row attribute columns and inverted lists used to pre-filter searches
+
+    Numeric attributes are float arrays (NaN when unknown), single-valued
+    categories are integer codes, and multi-valued ones (products, channels)
+    map each value to the set of rows holding it.
+
+    Filters are dicts whose conditions are ANDed, e.g.::
+
+        {"segment": "gold"}                          # equality (or a list: any of)
+        {"products": ["SKU-1", "SKU-2"]}             # has any of these products
+        {"n_purchases": {">=": 3}}                   # numeric comparison
+        {"days_since_last_purchase": {"<=": 90}}     # recency
+    """
+
+    def __init__(self):
+        self.numeric = {name: np.zeros(0, dtype="float64") for name in NUMERIC_ATTRIBUTES}
+        self.codes = {name: np.zeros(0, dtype="int32") for name in SINGLE_VALUED_ATTRIBUTES}
+        self.vocabularies: Dict[str, Dict[str, int]] = {name: {} for name in SINGLE_VALUED_ATTRIBUTES}
+        self.postings: Dict[str, Dict[str, Set[int]]] = {name: {} for name in MULTI_VALUED_ATTRIBUTES}
+
+    def _reserve(self, n_rows: int) -> None:
+        capacity = len(self.numeric[NUMERIC_ATTRIBUTES[0]])
+        if n_rows <= capacity:
+            return
+        capacity = max(n_rows, 2 * capacity, 1024)
+        for name, column in self.numeric.items():
+            grown = np.full(capacity, np.nan)
+            grown[:len(column)] = column
+            self.numeric[name] = grown
+        for name, column in self.codes.items():
+            grown = np.full(capacity, -1, dtype="int32")
+            grown[:len(column)] = column
+            self.codes[name] = grown
+
+    def set(self, row: int, customer: Dict[str, Any]) -> None:
+        attributes = derive_attributes(customer)
+        self._reserve(row + 1)
+        for name in NUMERIC_ATTRIBUTES:
+            self.numeric[name][row] = attributes[name]
+        for name in SINGLE_VALUED_ATTRIBUTES:
+            value = attributes[name]
+            vocabulary = self.vocabularies[name]
+            if value is not None and value not in vocabulary:
+                vocabulary[value] = len(vocabulary)
+            self.codes[name][row] = -1 if value is None else vocabulary[value]
+        for name in MULTI_VALUED_ATTRIBUTES:
+            for value in attributes[name]:
+                self.postings[name].setdefault(value, set()).add(row)
+
+    def remove(self, row: int, customer: Dict[str, Any]) -> None:
+        """Forget a row's attributes; ``customer`` is the record it was indexed with"""
+        attributes = derive_attributes(customer)
+        for name in NUMERIC_ATTRIBUTES:
+            self.numeric[name][row] = np.nan
+        for name in SINGLE_VALUED_ATTRIBUTES:
+            self.codes[name][row] = -1
+        for name in MULTI_VALUED_ATTRIBUTES:
+            for value in attributes[name]:
+                self.postings[name].get(value, set()).discard(row)
+
+    def column(self, name: str, rows: np.ndarray) -> np.ndarray:
+        """Values of a numeric attribute for ``rows`` (NaN when unknown)"""
+        self._reserve(int(rows.max()) + 1 if len(rows) else 0)
+        return self.numeric[name][rows]
+
+    def top_values(self, name: str, n: int = 10) -> List[Tuple[str, int]]:
+        """Most common values of a multi-valued attribute with their row counts"""
+        counts = ((value, len(rows)) for value, rows in self.postings[name].items() if rows)
+        return heapq.nlargest(n, counts, key=lambda item: item[1])
+
+    def evaluate(self, filters: Dict[str, Any], n_rows: int) -> np.ndarray:
+        """Boolean mask over the first ``n_rows`` rows matching every condition"""
+        self._reserve(n_rows)
+        mask = np.ones(n_rows, dtype=bool)
+        for name, condition in filters.items():
+            if name in MULTI_VALUED_ATTRIBUTES:
+                values = condition if isinstance(condition, (list, tuple, set)) else [condition]
+                matched = np.zeros(n_rows, dtype=bool)
+                for value in values:
+                    rows = self.postings[name].get(str(value))
+                    if rows:
+                        matched[np.fromiter(rows, dtype="int64", count=len(rows))] = True
+                mask &= matched
+            elif name in SINGLE_VALUED_ATTRIBUTES:
+                values = condition if isinstance(condition, (list, tuple, set)) else [condition]
+                vocabulary = self.vocabularies[name]
+                codes = [vocabulary[str(v)] for v in values if str(v) in vocabulary]
+                mask &= np.isin(self.codes[name][:n_rows], codes)
+            elif name in NUMERIC_ATTRIBUTES or name in RECENCY_ATTRIBUTES:
+                mask &= self._compare(name, condition, n_rows)
+            else:
+                raise ValueError(f"Unknown filter attribute '{name}'")
+        return mask
+
+    def _compare(self, name: str, condition: Any, n_rows: int) -> np.ndarray:
+        if name in RECENCY_ATTRIBUTES:
+            column = (time.time() - self.numeric[RECENCY_ATTRIBUTES[name]][:n_rows]) / 86400
+        else:
+            column = self.numeric[name][:n_rows]
+        if not isinstance(condition, dict):
+            condition = {"==": condition}
+
+        mask = np.ones(n_rows, dtype=bool)
+        with np.errstate(invalid="ignore"):
+            for operator, value in condition.items():
+                if operator not in _COMPARISONS:
+                    raise ValueError(f"Unknown comparison '{operator}' for '{name}'")
+                # NaN (unknown) never matches
+                mask &= _COMPARISONS[operator](column, float(value))
+        return mask
+
+    def save(self, directory: str, n_rows: int) -> None:
+        np.savez(
+            os.path.join(directory, "attributes.npz"),
+            **{f"numeric_{name}": column[:n_rows] for name, column in self.numeric.items()},
+            **{f"codes_{name}": column[:n_rows] for name, column in self.codes.items()}
+        )
+        with open(os.path.join(directory, "attributes.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "vocabularies": self.vocabularies,
+                "postings": {
+                    name: {value: sorted(rows) for value, rows in postings.items() if rows}
+                    for name, postings in self.postings.items()
+                },
+            }, f, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, directory: str) -> "AttributeIndex":
+        index = cls()
+        with np.load(os.path.join(directory, "attributes.npz")) as arrays:
+            index.numeric = {name: arrays[f"numeric_{name}"] for name in NUMERIC_ATTRIBUTES}
+            index.codes = {name: arrays[f"codes_{name}"] for name in SINGLE_VALUED_ATTRIBUTES}
+        with open(os.path.join(directory, "attributes.json"), encoding="utf-8") as f:
+            data = json.load(f)
+        index.vocabularies = data["vocabularies"]
+        index.postings = {
+            name: {value: set(rows) for value, rows in data["postings"].get(name, {}).items()}
+            for name in MULTI_VALUED_ATTRIBUTES
+        }
+        return index
@@ -0,0 +1,206 @@
+import json
+import os
+import sys
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+COLUMNS = ("customer_id", "interaction_history", "purchase_history")
+
+
+class BinaryColumn:
+    """Variable-length bytes column: one shared buffer plus per-row start/length
+
+    Rewriting a row appends its new bytes and repoints the row, so updates never
+    shift other rows. ``compact`` drops the bytes no row points at any more.
+    """
+
+    def __init__(self):
+        self.data = np.zeros(0, dtype="uint8")
+        self.size = 0
+        self.starts = np.zeros(0, dtype="int64")
+        self.lengths = np.zeros(0, dtype="int32")
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes + self.starts.nbytes + self.lengths.nbytes
+
+    def _reserve_rows(self, n_rows: int) -> None:
+        if n_rows > len(self.starts):
+            capacity = max(n_rows, 2 * len(self.starts), 1024)
+            self.starts = np.resize(self.starts, capacity)
+            self.lengths = np.resize(self.lengths, capacity)
+
+    def _reserve_bytes(self, n_bytes: int) -> None:
+        if self.size + n_bytes > len(self.data):
+            capacity = max(self.size + n_bytes, 2 * len(self.data), 1 << 16)
+            grown = np.zeros(capacity, dtype="uint8")
+            grown[:self.size] = self.data[:self.size]
+            self.data = grown
+
+    def set(self, row: int, value: bytes) -> None:
+        self._reserve_rows(row + 1)
+        self._reserve_bytes(len(value))
+        self.data[self.size:self.size + len(value)] = np.frombuffer(value, dtype="uint8")
+        self.starts[row] = self.size
+        self.lengths[row] = len(value)
+        self.size += len(value)
+
+    def get(self, row: int) -> bytes:
+        start = self.starts[row]
+        return self.data[start:start + self.lengths[row]].tobytes()
+
+    def live_bytes(self, rows: np.ndarray) -> int:
+        return int(self.lengths[rows].sum())
+
+    def compact(self, n_rows: int, rows: np.ndarray) -> None:
+        """Rewrite the buffer keeping only the bytes of ``rows``"""
+        data = np.zeros(max(self.live_bytes(rows), 1), dtype="uint8")
+        starts = np.zeros(n_rows, dtype="int64")
+        offset = 0
+        for row in rows:
+            length = self.lengths[row]
+            data[offset:offset + length] = self.data[self.starts[row]:self.starts[row] + length]
+            starts[row] = offset
+            offset += length
+        self.data, self.size = data, offset
+        self.starts, self.lengths = starts, self.lengths[:n_rows].copy()
+
+    def save(self, directory: str, name: str, n_rows: int) -> None:
+        np.save(os.path.join(directory, f"{name}.data.npy"), self.data[:self.size])
+        np.save(os.path.join(directory, f"{name}.starts.npy"), self.starts[:n_rows])
+        np.save(os.path.join(directory, f"{name}.lengths.npy"), self.lengths[:n_rows])
+
+    @classmethod
+    def load(cls, directory: str, name: str, mmap: bool = True) -> "BinaryColumn":
+        mode = "r" if mmap else None
+        column = cls()
+        column.data = np.load(os.path.join(directory, f"{name}.data.npy"), mmap_mode=mode)
+        column.size = len(column.data)
+        column.starts = np.load(os.path.join(directory, f"{name}.starts.npy"), mmap_mode=mode)
+        column.lengths = np.load(os.path.join(directory, f"{name}.lengths.npy"), mmap_mode=mode)
+        return column
+
+    def make_writable(self) -> None:
+        self.data = np.array(self.data)
+        self.starts = np.array(self.starts)
+        self.lengths = np.array(self.lengths)
+
+
+class CustomerTable:
+    """Columnar customer records, materialized into dicts only when read
+
+    Each field is stored as compact JSON in a ``BinaryColumn``; row numbers are
+    stable (removed rows are only marked dead) so they can double as FAISS ids.
+    Bytes of replaced and removed rows are counted so callers know when to
+    ``compact``.
+    """
+
+    def __init__(self):
+        self.columns = {name: BinaryColumn() for name in COLUMNS}
+        self.live = np.zeros(0, dtype=bool)
+        self.n_rows = 0
+        self.dead_bytes = 0
+
+    def __len__(self) -> int:
+        return self.n_rows
+
+    @property
+    def nbytes(self) -> int:
+        return sum(column.nbytes for column in self.columns.values()) + self.live.nbytes
+
+    @property
+    def dead_fraction(self) -> float:
+        """Share of the stored bytes that no live row points at"""
+        total = sum(column.size for column in self.columns.values())
+        return self.dead_bytes / total if total else 0.0
+
+    def _row_bytes(self, row: int) -> int:
+        return sum(int(column.lengths[row]) for column in self.columns.values())
+
+    def append_row(self) -> int:
+        row = self.n_rows
+        if row >= len(self.live):
+            self.live = np.resize(self.live, max(2 * len(self.live), 1024))
+        self.live[row] = False
+        self.n_rows += 1
+        return row
+
+    def set(self, row: int, customer: Dict[str, Any]) -> None:
+        if self.live[row]:
+            self.dead_bytes += self._row_bytes(row)
+        for name in COLUMNS:
+            self.columns[name].set(
+                row,
+                json.dumps(customer[name], separators=(",", ":"), default=str).encode("utf-8")
+            )
+        self.live[row] = True
+
+    def delete(self, row: int) -> None:
+        if self.live[row]:
+            self.dead_bytes += self._row_bytes(row)
+        self.live[row] = False
+
+    def is_live(self, row: int) -> bool:
+        return bool(self.live[row])
+
+    def get(self, row: int) -> Optional[Dict[str, Any]]:
+        """Materialize one row as a customer dict"""
+        if not self.is_live(row):
+            return None
+        return {name: json.loads(self.columns[name].get(row)) for name in COLUMNS}
+
+    def get_field(self, row: int, name: str) -> Any:
+        return json.loads(self.columns[name].get(row))
+
+    def live_rows(self) -> np.ndarray:
+        return np.flatnonzero(self.live[:self.n_rows])
+
+    def iter_records(self) -> Iterator[Dict[str, Any]]:
+        for row in self.live_rows():
+            yield self.get(row)
+
+    def records(self, rows: List[int]) -> List[Dict[str, Any]]:
+        return [self.get(row) for row in rows]
+
+    def compact(self) -> None:
+        """Reclaim bytes left behind by updated and removed rows"""
+        rows = self.live_rows()
+        for column in self.columns.values():
+            column.compact(self.n_rows, rows)
+        self.dead_bytes = 0
+
+    def save(self, directory: str) -> None:
+        for name, column in self.columns.items():
+            column.save(directory, name, self.n_rows)
+        np.save(os.path.join(directory, "live.npy"), self.live[:self.n_rows])
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> "CustomerTable":
+        table = cls()
+        table.columns = {name: BinaryColumn.load(directory, name, mmap) for name in COLUMNS}
+        table.live = np.load(os.path.join(directory, "live.npy"), mmap_mode="r" if mmap else None)
+        table.n_rows = len(table.live)
+        rows = table.live_rows()
+        table.dead_bytes = sum(column.size - column.live_bytes(rows) for column in table.columns.values())
+        return table
+
+    def make_writable(self) -> None:
+        for column in self.columns.values():
+            column.make_writable()
+        self.live = np.array(self.live)
+
+
+def deep_sizeof(obj: Any, seen: Optional[set] = None) -> int:
+    """Approximate retained size of nested Python containers"""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    return size
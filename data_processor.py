@@ -1,81 +1,240 @@
 import streamlit as st
-import pandas as pd
-from io import StringIO
-import json
-from vector_store import VectorStore
-
-# Initialize vector store in session state
-if "vector_store" not in st.session_state:
-    st.session_state.vector_store = VectorStore()
+import time
+from functools import partial
+from config import INGEST_POLL_SECONDS, MAX_REPORTED_ERRORS, PRECOMPUTE_NEIGHBOURS, PREVIEW_ROWS
+from dataset_profile import build_profile, load_profile, profile_rows, save_profile
+from ingest_jobs import get_job_registry
+from ingestion import (
+    FILE_FORMATS,
+    IngestionError,
+    count_customer_rows,
+    detect_format,
+    get_decode_pool,
+    iter_customer_records,
+)
+from vector_store import VectorStore, dataset_fingerprint
+
+def _init_session_state():
+    """Initialize vector store and upload memo in session state"""
+    if "vector_store" not in st.session_state:
+        st.session_state.vector_store = VectorStore()
+    if "upload_fingerprints" not in st.session_state:
+        st.session_state.upload_fingerprints = {}
+    if "processed_uploads" not in st.session_state:
+        st.session_state.processed_uploads = {}
+    if "ingest_jobs" not in st.session_state:
+        st.session_state.ingest_jobs = {}
+
+def _upload_fingerprint(uploaded_file):
+    """Content fingerprint of an upload, hashed once per uploaded file"""
+    file_id = getattr(uploaded_file, "file_id", None)
+    fingerprint = st.session_state.upload_fingerprints.get(file_id)
+    if fingerprint is None:
+        fingerprint = dataset_fingerprint(uploaded_file.getbuffer())
+        if file_id is not None:
+            st.session_state.upload_fingerprints[file_id] = fingerprint
+    return fingerprint
+
+def ingest_customer_file(uploaded_file, progress_callback=None):
+    """Stream a customer file into a fresh vector store, one block at a time
+
+    Only the current block's records are held in memory; the returned summary
+    keeps the row count and a few preview rows instead of the full dataset.
+    Rows that fail to decode or validate are counted and reported, not indexed.
+    The summary is then extended into the dataset profile (see build_profile).
+    ``progress_callback`` receives a dict of rows_parsed, rows_embedded,
+    invalid_rows, rows_per_second and total_rows (None for CSV) after every
+    embedding batch.
+    """
+    vector_store = VectorStore()
+    summary = {"rows": 0, "preview": [], "invalid_rows": 0, "invalid_by_column": {}, "errors": []}
+    progress = {"rows_parsed": 0, "rows_embedded": 0, "invalid_rows": 0, "rows_per_second": 0.0}
+    start = time.perf_counter()
+
+    def report_embedded(rows_done, total_rows, rows_per_second):
+        if progress_callback is not None:
+            elapsed = time.perf_counter() - start
+            progress["rows_embedded"] = summary["rows"] + rows_done
+            progress["rows_per_second"] = progress["rows_embedded"] / elapsed if elapsed else 0.0
+            progress_callback(dict(progress))
+
+    file_format = detect_format(uploaded_file.name)
+    progress["total_rows"] = count_customer_rows(uploaded_file, file_format)
+    for records, errors in iter_customer_records(uploaded_file, file_format, pool=get_decode_pool()):
+        progress["rows_parsed"] += len(records) + len(errors)
+        progress["invalid_rows"] += len(errors)
+        summary["invalid_rows"] += len(errors)
+        for error in errors:
+            column = error["column"]
+            summary["invalid_by_column"][column] = summary["invalid_by_column"].get(column, 0) + 1
+        summary["errors"].extend(errors[:MAX_REPORTED_ERRORS - len(summary["errors"])])
+        missing_preview = PREVIEW_ROWS - len(summary["preview"])
+        if missing_preview > 0:
+            summary["preview"].extend(records[:missing_preview])
+        vector_store.add_customers(records, progress_callback=report_embedded)
+        summary["rows"] += len(records)
+
+    if PRECOMPUTE_NEIGHBOURS:
+        vector_store.precompute_neighbours()
+    return vector_store, build_profile(vector_store, summary)
+
+def _ingest_and_snapshot(fingerprint, uploaded_file, progress_callback):
+    """Ingestion job body: build the store off the script thread and persist it"""
+    uploaded_file.seek(0)
+    vector_store, summary = ingest_customer_file(uploaded_file, progress_callback)
+    vector_store.save_snapshot(fingerprint)
+    save_profile(fingerprint, summary)
+    return vector_store, summary
+
+def _activate(fingerprint, vector_store, summary):
+    """Swap a finished store into the session in one step"""
+    # The store is the only full copy; the session keeps just the summary
+    st.session_state.vector_store = vector_store
+    st.session_state.customer_data = summary
+    st.session_state.processed_uploads[fingerprint] = summary
 
 def process_customer_data(uploaded_file):
-    """Process uploaded customer data file"""
-    try:
-        # Read CSV file
-        df = pd.read_csv(uploaded_file)
-
-        # Basic validation
-        required_columns = ['customer_id', 'interaction_history', 'purchase_history']
-        missing_columns = [col for col in required_columns if col not in df.columns]
-
-        if missing_columns:
-            return False, f"Missing required columns: {', '.join(missing_columns)}"
-
-        # Process and structure the data
-        processed_data = []
-        for _, row in df.iterrows():
-            customer_data = {
-                "customer_id": row["customer_id"],
-                "interaction_history": json.loads(row["interaction_history"]) 
-                    if isinstance(row["interaction_history"], str) else row["interaction_history"],
-                "purchase_history": json.loads(row["purchase_history"]) 
-                    if isinstance(row["purchase_history"], str) else row["purchase_history"]
-            }
-            processed_data.append(customer_data)
-
-        # Add to vector store
-        st.session_state.vector_store.add_customers(processed_data)
-        st.session_state.customer_data = processed_data
-
-        return True, processed_data
+    """Process uploaded customer data file
 
+    Returns (True, summary) once the dataset is active, (False, error) on
+    failure, or (None, job) while a background ingestion job is running.
+    """
+    try:
+        # Streamlit reruns the script on every interaction; an unchanged upload is a no-op
+        fingerprint = _upload_fingerprint(uploaded_file)
+        if (fingerprint in st.session_state.processed_uploads
+                and st.session_state.vector_store.fingerprint == fingerprint):
+            return True, st.session_state.processed_uploads[fingerprint]
+
+        # A job already started for this upload: swap its store in once it is done
+        registry = get_job_registry()
+        job = registry.get(st.session_state.ingest_jobs.get(fingerprint))
+        if job is not None:
+            if job.is_active:
+                return None, job
+            # Forget the job either way, so a failed upload can be retried
+            del st.session_state.ingest_jobs[fingerprint]
+            if job.status == "failed":
+                return False, job.error
+            vector_store = registry.take_vector_store(job)
+            if vector_store is not None:
+                _activate(fingerprint, vector_store, job.summary)
+                return True, job.summary
+            # Another session took the store; load the snapshot the job saved
+
+        # Reuse the on-disk snapshot if this exact dataset was indexed before
+        vector_store = VectorStore.load_snapshot(fingerprint)
+        if vector_store is not None:
+            summary = load_profile(fingerprint)
+            if summary is None:
+                # Snapshot written before profiles existed; profile it once now
+                summary = build_profile(
+                    vector_store, {"rows": len(vector_store), "preview": vector_store.head(PREVIEW_ROWS)}
+                )
+                save_profile(fingerprint, summary)
+            _activate(fingerprint, vector_store, summary)
+            return True, summary
+
+        # Index in the background; the session keeps using its current store meanwhile
+        detect_format(uploaded_file.name)
+        job = get_job_registry().submit(
+            fingerprint, uploaded_file, partial(_ingest_and_snapshot, fingerprint)
+        )
+        st.session_state.ingest_jobs[fingerprint] = job.id
+        return None, job
+
+    except IngestionError as e:
+        return False, str(e)
     except Exception as e:
         return False, f"Error processing file: {str(e)}"
 
+@st.fragment(run_every=INGEST_POLL_SECONDS)
+def _render_ingest_job(job_id):
+    """Poll a background ingestion job without rerunning the whole page"""
+    job = get_job_registry().get(job_id)
+    if job is None or not job.is_active:
+        # Finished (or expired): a full rerun swaps the new store in or reports the error
+        st.rerun()
+
+    if job.status == "queued":
+        st.info("Waiting for another ingestion job to finish...")
+        return
+    st.progress(job.fraction_done or 0.0, text=f"Indexing {job.filename}...")
+    eta = job.eta_seconds
+    st.caption(
+        f"Parsed {job.rows_parsed:,} rows, embedded {job.rows_embedded:,} "
+        f"({job.rows_per_second:,.0f} rows/s)"
+        + (f", about {eta:,.0f}s left" if eta is not None else "")
+    )
+    if st.session_state.customer_data is not None:
+        st.caption("Chat keeps using the previously loaded dataset until indexing finishes.")
+
+def _render_profile(profile):
+    """Render the precomputed dataset profile; nothing here scans the dataset"""
+    st.subheader("Data Preview")
+    st.dataframe(profile["preview"])
+
+    st.subheader("Data Statistics")
+    st.write(f"Total customers: {profile['rows']}")
+    st.dataframe(profile_rows(profile))
+    if profile["top_products"]:
+        st.caption("Top products (customers purchasing)")
+        st.dataframe([{"product": product, "customers": count} for product, count in profile["top_products"]])
+
+    if profile["invalid_rows"]:
+        st.warning(
+            f"{profile['invalid_rows']:,} rows were quarantined and not indexed "
+            f"(showing the first {len(profile['errors']):,})."
+        )
+        st.dataframe(profile["errors"])
+        st.download_button(
+            "Download error report",
+            profile["errors_csv"],
+            file_name="quarantined_rows.csv",
+            mime="text/csv"
+        )
+    memory = profile["memory"]
+    if memory["customers"]:
+        st.caption(
+            f"Memory: {memory['bytes_per_customer_after']:,.0f} bytes/customer "
+            f"(vs. {memory['bytes_per_customer_before']:,.0f} as dicts + float32 vectors)"
+        )
+
+    # Show similar customer patterns
+    if profile["sample_customer_id"] is not None:
+        st.subheader("Customer Similarity Analysis")
+        st.write("Similar customer patterns found:", profile["sample_similar_customers"])
+        similarity = profile["similarity"]
+        nearest = similarity["nearest_similarity"]
+        if nearest["mean"] is not None:
+            st.caption(
+                f"Nearest-neighbour similarity over {similarity['sample_size']:,} customers: "
+                f"mean {nearest['mean']:.2f}, p10 {nearest['p10']:.2f}, p90 {nearest['p90']:.2f}"
+            )
+        if similarity["clusters"]:
+            st.dataframe(similarity["clusters"])
+
 def render_data_upload():
     """Render data upload interface"""
+    _init_session_state()
     st.subheader("Upload Customer Data")
 
     uploaded_file = st.file_uploader(
-        "Choose a CSV file",
-        type="csv",
-        help="Upload a CSV file containing customer data"
+        "Choose a customer data file",
+        type=list(FILE_FORMATS),
+        help="Upload a CSV, Parquet, Feather/Arrow or JSON Lines file containing customer data"
     )
 
     if uploaded_file is not None:
         # Process the uploaded file
         success, result = process_customer_data(uploaded_file)
 
-        if success:
+        if success is None:
+            _render_ingest_job(result.id)
+        elif success:
             st.success("Data uploaded and processed successfully!")
 
-            # Display data preview
-            st.subheader("Data Preview")
-            df = pd.DataFrame(result)
-            st.dataframe(df.head())
-
-            # Display basic statistics
-            st.subheader("Data Statistics")
-            st.write(f"Total customers: {len(result)}")
-
-            # Show similar customer patterns
-            if len(result) > 0:
-                st.subheader("Customer Similarity Analysis")
-                sample_customer = result[0]
-                similar_customers = st.session_state.vector_store.search_similar_customers(
-                    st.session_state.vector_store._create_text_representation(sample_customer)
-                )
-                st.write("Similar customer patterns found:", len(similar_customers))
+            _render_profile(result)
 
         else:
             st.error(f"Error: {result}")
@@ -0,0 +1,151 @@
+import json
+import math
+import os
+from typing import Any, Dict, List, Optional
+
+import faiss
+import numpy as np
+import pandas as pd
+
+from config import EMBEDDING_MODEL_NAME, PROFILE_CLUSTERS, PROFILE_SAMPLE_SIZE, PROFILE_TOP_PRODUCTS
+from vector_store import VectorStore, snapshot_path
+
+PROFILE_FILE = "profile.json"
+# History length buckets shown in the distribution table
+LENGTH_BUCKETS = [(0, 0), (1, 1), (2, 2), (3, 5), (6, 10), (11, None)]
+
+
+def _number(value: float) -> Optional[float]:
+    # JSON has no NaN; unknown statistics are stored as null
+    return None if value is None or math.isnan(value) else float(value)
+
+
+def length_distribution(lengths: np.ndarray) -> Dict[str, Any]:
+    """Summary statistics and bucket counts of per-customer history lengths"""
+    if len(lengths) == 0:
+        return {"mean": None, "p50": None, "p90": None, "max": None, "buckets": {}}
+    buckets = {}
+    for low, high in LENGTH_BUCKETS:
+        label = f"{low}+" if high is None else (str(low) if low == high else f"{low}-{high}")
+        in_bucket = lengths >= low if high is None else (lengths >= low) & (lengths <= high)
+        buckets[label] = int(in_bucket.sum())
+    return {
+        "mean": float(lengths.mean()),
+        "p50": float(np.percentile(lengths, 50)),
+        "p90": float(np.percentile(lengths, 90)),
+        "max": int(lengths.max()),
+        "buckets": buckets,
+    }
+
+
+def similarity_profile(vector_store: VectorStore, sample_size: int = PROFILE_SAMPLE_SIZE,
+                       n_clusters: int = PROFILE_CLUSTERS, seed: int = 0) -> Dict[str, Any]:
+    """Nearest-neighbour similarity and k-means cluster statistics over a sample"""
+    rows, vectors = vector_store.sample_vectors(sample_size, seed)
+    similarities = vector_store.nearest_similarities(rows)
+    similarities = similarities[~np.isnan(similarities)]
+    profile = {
+        "sample_size": len(rows),
+        "nearest_similarity": {
+            "mean": _number(similarities.mean()) if len(similarities) else None,
+            "p10": _number(np.percentile(similarities, 10)) if len(similarities) else None,
+            "p50": _number(np.percentile(similarities, 50)) if len(similarities) else None,
+            "p90": _number(np.percentile(similarities, 90)) if len(similarities) else None,
+        },
+        "clusters": [],
+    }
+
+    # faiss warns below ~39 points per centroid, so small datasets get fewer clusters
+    n_clusters = min(n_clusters, len(rows) // 39)
+    if n_clusters < 2:
+        return profile
+    kmeans = faiss.Kmeans(vectors.shape[1], n_clusters, niter=20, seed=seed, spherical=True)
+    kmeans.train(vectors)
+    similarity, assignment = kmeans.index.search(vectors, 1)
+    for cluster in range(n_clusters):
+        members = assignment[:, 0] == cluster
+        if members.any():
+            profile["clusters"].append({
+                "cluster": cluster,
+                "share": float(members.mean()),
+                "cohesion": float(similarity[members, 0].mean()),
+            })
+    profile["clusters"].sort(key=lambda item: item["share"], reverse=True)
+    return profile
+
+
+def build_profile(vector_store: VectorStore, summary: Dict[str, Any]) -> Dict[str, Any]:
+    """Dataset profile shown by the upload panel, computed once per dataset
+
+    ``summary`` is the ingestion summary (rows, preview, invalid rows and
+    errors); it is extended with history-length distributions, empty-history
+    counts, top products, memory use and similarity/cluster statistics.
+    """
+    n_interactions = vector_store.attribute_values("n_interactions")
+    n_purchases = vector_store.attribute_values("n_purchases")
+    errors = summary.get("errors", [])
+
+    preview = summary.get("preview", [])
+    sample_id = preview[0]["customer_id"] if preview else None
+    sample_similar = 0
+    if sample_id is not None:
+        sample_similar = len(
+            vector_store.similar_customers_for_ids([sample_id]).get(str(sample_id), [])
+        )
+
+    return {
+        **summary,
+        "errors": errors,
+        "invalid_rows": summary.get("invalid_rows", 0),
+        "invalid_by_column": summary.get("invalid_by_column", {}),
+        # The error report is rendered to CSV once, not on every rerun
+        "errors_csv": pd.DataFrame(errors).to_csv(index=False) if errors else "",
+        "empty_histories": {
+            "interaction_history": int((n_interactions == 0).sum()),
+            "purchase_history": int((n_purchases == 0).sum()),
+        },
+        "history_lengths": {
+            "interaction_history": length_distribution(n_interactions),
+            "purchase_history": length_distribution(n_purchases),
+        },
+        "top_products": vector_store.top_attribute_values("products", PROFILE_TOP_PRODUCTS),
+        "memory": vector_store.memory_report(),
+        "similarity": similarity_profile(vector_store),
+        "sample_customer_id": sample_id,
+        "sample_similar_customers": sample_similar,
+    }
+
+
+def save_profile(fingerprint: str, profile: Dict[str, Any],
+                 model_name: str = EMBEDDING_MODEL_NAME) -> None:
+    """Store a profile next to the dataset's vector store snapshot"""
+    directory = snapshot_path(fingerprint, model_name)
+    os.makedirs(directory, exist_ok=True)
+    staging = os.path.join(directory, f"{PROFILE_FILE}.tmp-{os.getpid()}")
+    with open(staging, "w", encoding="utf-8") as f:
+        json.dump(profile, f, default=str)
+    os.replace(staging, os.path.join(directory, PROFILE_FILE))
+
+
+def load_profile(fingerprint: str, model_name: str = EMBEDDING_MODEL_NAME) -> Optional[Dict[str, Any]]:
+    """The cached profile for a dataset fingerprint, or None"""
+    directory = snapshot_path(fingerprint, model_name)
+    try:
+        with open(os.path.join(directory, PROFILE_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def profile_rows(profile: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Per-column history statistics as table rows"""
+    return [
+        {
+            "column": column,
+            "empty": profile["empty_histories"][column],
+            "invalid": profile["invalid_by_column"].get(column, 0),
+            **{key: stats[key] for key in ("mean", "p50", "p90", "max")},
+            **stats["buckets"],
+        }
+        for column, stats in profile["history_lengths"].items()
+    ]
@@ -0,0 +1,223 @@
+import atexit
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config import (
+    EMBEDDING_CACHE_MAX_ENTRIES,
+    EMBEDDING_CACHE_PATH,
+    EMBEDDING_DEVICE,
+    EMBEDDING_MODEL_NAME,
+    EMBED_YIELD_ROWS,
+)
+
+# Known output dimensions, so an index can be sized without loading weights
+MODEL_DIMENSIONS = {
+    "all-MiniLM-L6-v2": 384,
+    "all-MiniLM-L12-v2": 384,
+    "all-mpnet-base-v2": 768,
+}
+
+_registry: Dict[str, "SharedEmbeddingModel"] = {}
+_caches: Dict[str, "EmbeddingCache"] = {}
+_registry_lock = threading.Lock()
+
+# SQLite's bound-parameter limit is 999 on older builds
+_SQL_BATCH = 500
+
+
+class SharedEmbeddingModel:
+    """Process-wide embedding model, loaded once on first use
+
+    In-process encodes are serialized. Query encodes (``encode``) go first:
+    bulk encodes (``encode_bulk``) run in small slices and wait between
+    slices while a query is queued, so chat stays responsive during ingest.
+    """
+
+    def __init__(self, model_name: str, device: Optional[str] = None):
+        self.model_name = model_name
+        self.device = device
+        self._model = None
+        self._load_lock = threading.Lock()
+        self._encode_lock = threading.Lock()
+        self._queries = threading.Condition()
+        self._queries_waiting = 0
+        self._pool_lock = threading.Lock()
+        self._pool = None
+        self._pool_size = 0
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._model is not None
+
+    @property
+    def model(self):
+        """Return the underlying SentenceTransformer, loading it if needed"""
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+                    self._model = SentenceTransformer(self.model_name, device=self.device)
+        return self._model
+
+    @property
+    def dimension(self) -> int:
+        if self.model_name in MODEL_DIMENSIONS and self._model is None:
+            return MODEL_DIMENSIONS[self.model_name]
+        return self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts: List[str], **kwargs) -> np.ndarray:
+        """Encode texts into float32 embeddings; safe to call from any thread"""
+        model = self.model
+        with self._queries:
+            self._queries_waiting += 1
+        try:
+            with self._encode_lock:
+                embeddings = model.encode(texts, **kwargs)
+        finally:
+            with self._queries:
+                self._queries_waiting -= 1
+                self._queries.notify_all()
+        return np.asarray(embeddings, dtype="float32")
+
+    def encode_bulk(self, texts: List[str], slice_rows: int = EMBED_YIELD_ROWS, **kwargs) -> np.ndarray:
+        """Like encode, but gives way to queued query encodes every ``slice_rows`` texts"""
+        model = self.model
+        embeddings = np.empty((len(texts), self.dimension), dtype="float32")
+        for start in range(0, len(texts), slice_rows):
+            with self._queries:
+                self._queries.wait_for(lambda: self._queries_waiting == 0)
+            with self._encode_lock:
+                embeddings[start:start + slice_rows] = model.encode(texts[start:start + slice_rows], **kwargs)
+        return embeddings
+
+    def encode_multi_process(self, texts: List[str], workers: int,
+                             batch_size: int = 32) -> np.ndarray:
+        """Encode texts across a pool of CPU worker processes
+
+        The pool has its own lock: query encodes run in-process meanwhile.
+        """
+        model = self.model
+        with self._pool_lock:
+            if self._pool is None or self._pool_size != workers:
+                self._stop_pool()
+                self._pool = model.start_multi_process_pool(target_devices=["cpu"] * workers)
+                self._pool_size = workers
+                atexit.register(self._stop_pool)
+            embeddings = model.encode_multi_process(texts, self._pool, batch_size=batch_size)
+        return np.asarray(embeddings, dtype="float32")
+
+    def _stop_pool(self) -> None:
+        if self._pool is not None:
+            self._model.stop_multi_process_pool(self._pool)
+            self._pool = None
+            self._pool_size = 0
+
+
+def get_embedding_model(model_name: str = EMBEDDING_MODEL_NAME,
+                        device: Optional[str] = EMBEDDING_DEVICE) -> SharedEmbeddingModel:
+    """Get the shared embedding model for this process (weights load lazily)"""
+    key = f"{model_name}@{device or 'auto'}"
+    with _registry_lock:
+        shared = _registry.get(key)
+        if shared is None:
+            shared = SharedEmbeddingModel(model_name, device)
+            _registry[key] = shared
+    return shared
+
+
+def warm_up_embedding_model(model_name: str = EMBEDDING_MODEL_NAME,
+                            device: Optional[str] = EMBEDDING_DEVICE) -> SharedEmbeddingModel:
+    """Load the model weights now instead of on the first user request"""
+    shared = get_embedding_model(model_name, device)
+    shared.encode(["warm up"])
+    return shared
+
+
+class EmbeddingCache:
+    """On-disk embedding cache keyed by a hash of model name and text
+
+    Entries are evicted least-recently-used once the cache holds more than
+    ``max_entries`` vectors. Safe to share between threads and processes.
+    """
+
+    def __init__(self, path: str, max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings "
+            "(key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_lru ON embeddings (last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model_name: str, text: str) -> str:
+        return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Return cached vectors for whichever keys are present"""
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), _SQL_BATCH):
+                batch = keys[start:start + _SQL_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype="float32")
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, keys: List[str], vectors: np.ndarray) -> None:
+        """Store vectors and evict the least recently used beyond the size bound"""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [
+                    (key, np.asarray(vector, dtype="float32").tobytes(), now)
+                    for key, vector in zip(keys, vectors)
+                ]
+            )
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+            self._conn.commit()
+
+
+def get_embedding_cache(path: str = EMBEDDING_CACHE_PATH) -> Optional[EmbeddingCache]:
+    """Get the process-wide embedding cache, or None when caching is disabled"""
+    if not path:
+        return None
+    with _registry_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            cache = EmbeddingCache(path)
+            _caches[path] = cache
+    return cache
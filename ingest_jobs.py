@@ -0,0 +1,133 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from config import INGEST_JOB_RETENTION_SECONDS, INGEST_JOB_WORKERS
+
+# ingest_fn(source, progress_callback) -> (vector_store, summary)
+IngestFn = Callable[[Any, Callable[[Dict[str, Any]], None]], Tuple[Any, Dict[str, Any]]]
+
+
+class IngestJob:
+    """Progress and result of one background ingestion"""
+
+    def __init__(self, fingerprint: str, filename: str, total_bytes: int):
+        self.id = uuid.uuid4().hex
+        self.fingerprint = fingerprint
+        self.filename = filename
+        self.total_bytes = total_bytes
+        self.status = "queued"
+        self.rows_parsed = 0
+        self.rows_embedded = 0
+        self.invalid_rows = 0
+        self.rows_per_second = 0.0
+        self.total_rows: Optional[int] = None
+        self.fraction_done: Optional[float] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.error: Optional[str] = None
+        self.vector_store = None
+        self.summary: Optional[Dict[str, Any]] = None
+
+    @property
+    def is_active(self) -> bool:
+        return self.status in ("queued", "running")
+
+    @property
+    def eta_seconds(self) -> Optional[float]:
+        """Remaining time extrapolated from the share of the file done so far"""
+        if self.status != "running" or not self.fraction_done:
+            return None
+        elapsed = time.time() - self.started_at
+        return elapsed * (1 - self.fraction_done) / self.fraction_done
+
+    def update(self, stats: Dict[str, Any], position: Optional[int] = None) -> None:
+        self.rows_parsed = stats["rows_parsed"]
+        self.rows_embedded = stats["rows_embedded"]
+        self.invalid_rows = stats["invalid_rows"]
+        self.rows_per_second = stats["rows_per_second"]
+        self.total_rows = stats.get("total_rows")
+        # Rows embedded when the row count is known up front; else bytes read (CSV)
+        if self.total_rows:
+            self.fraction_done = min(self.rows_embedded / self.total_rows, 1.0)
+        elif position and self.total_bytes:
+            self.fraction_done = min(position / self.total_bytes, 1.0)
+
+
+class IngestJobRegistry:
+    """Process-wide registry running ingestion jobs on a small thread pool
+
+    Jobs are keyed by dataset fingerprint, so sessions uploading the same file
+    share one job. Finished jobs are kept for a while for late pollers.
+    """
+
+    def __init__(self, max_workers: int = INGEST_JOB_WORKERS,
+                 retention_seconds: float = INGEST_JOB_RETENTION_SECONDS):
+        self.retention_seconds = retention_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self._jobs: Dict[str, IngestJob] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, fingerprint: str, source, ingest_fn: IngestFn) -> IngestJob:
+        with self._lock:
+            self._prune()
+            for job in self._jobs.values():
+                if job.fingerprint == fingerprint and job.status != "failed":
+                    return job
+            job = IngestJob(fingerprint, getattr(source, "name", ""), getattr(source, "size", 0))
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, source, ingest_fn)
+        return job
+
+    def get(self, job_id: Optional[str]) -> Optional[IngestJob]:
+        with self._lock:
+            self._prune()
+            return self._jobs.get(job_id)
+
+    def take_vector_store(self, job: IngestJob):
+        """Hand a finished job's store to one caller and drop the job's reference
+
+        Later callers get None and should load the job's snapshot instead.
+        """
+        with self._lock:
+            vector_store, job.vector_store = job.vector_store, None
+        return vector_store
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.retention_seconds
+        for job_id in [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and job.finished_at < cutoff
+        ]:
+            del self._jobs[job_id]
+
+    @staticmethod
+    def _run(job: IngestJob, source, ingest_fn: IngestFn) -> None:
+        job.status = "running"
+        job.started_at = time.time()
+
+        def report_progress(stats):
+            job.update(stats, position=source.tell() if hasattr(source, "tell") else None)
+
+        try:
+            job.vector_store, job.summary = ingest_fn(source, report_progress)
+            job.status = "done"
+        except Exception as e:
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+
+
+_registry: Optional[IngestJobRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_job_registry() -> IngestJobRegistry:
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = IngestJobRegistry()
+    return _registry
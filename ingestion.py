@@ -0,0 +1,256 @@
+import json
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.json as pajson
+import pyarrow.parquet as pq
+
+from config import INGEST_BATCH_ROWS, INGEST_BLOCK_BYTES, INGEST_WORKERS
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:  # orjson is optional; fall back to the stdlib parser
+    _json_loads = json.loads
+
+REQUIRED_COLUMNS = ["customer_id", "interaction_history", "purchase_history"]
+# Fixed types so every streamed block agrees, whatever the first block looked like
+CSV_COLUMN_TYPES = {name: pa.string() for name in REQUIRED_COLUMNS}
+# Upload extension -> reader format
+FILE_FORMATS = {
+    "csv": "csv",
+    "parquet": "parquet",
+    "feather": "arrow",
+    "arrow": "arrow",
+    "ipc": "arrow",
+    "jsonl": "jsonl",
+    "ndjson": "jsonl",
+}
+
+
+_decode_pool: Optional[ProcessPoolExecutor] = None
+_decode_pool_lock = threading.Lock()
+
+
+class IngestionError(ValueError):
+    """The uploaded data cannot be ingested (e.g. required columns are missing)"""
+
+
+def get_decode_pool() -> Optional[ProcessPoolExecutor]:
+    """Process pool shared by all uploads, or None when decoding runs in-process"""
+    global _decode_pool
+    if INGEST_WORKERS <= 1:
+        return None
+    with _decode_pool_lock:
+        if _decode_pool is None:
+            # spawn, not fork: the Streamlit server process is multithreaded
+            _decode_pool = ProcessPoolExecutor(
+                max_workers=INGEST_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+    return _decode_pool
+
+
+def check_columns(column_names: List[str]) -> None:
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in column_names]
+    if missing_columns:
+        raise IngestionError(f"Missing required columns: {', '.join(missing_columns)}")
+
+
+def _csv_convert_options() -> pacsv.ConvertOptions:
+    # Columns outside REQUIRED_COLUMNS are skipped by the parser, never converted
+    return pacsv.ConvertOptions(column_types=CSV_COLUMN_TYPES, include_columns=REQUIRED_COLUMNS)
+
+
+def _missing_csv_column(error: pa.ArrowKeyError) -> IngestionError:
+    # pyarrow names the first included column the header lacks
+    missing_columns = [col for col in REQUIRED_COLUMNS if f"'{col}'" in str(error)]
+    if not missing_columns:
+        raise error
+    return IngestionError(f"Missing required columns: {', '.join(missing_columns)}")
+
+
+def detect_format(filename: str) -> str:
+    """Reader format for an uploaded file name"""
+    extension = os.path.splitext(filename)[1].lstrip(".").lower()
+    if extension not in FILE_FORMATS:
+        raise IngestionError(
+            f"Unsupported file type '.{extension}', expected one of: {', '.join(FILE_FORMATS)}"
+        )
+    return FILE_FORMATS[extension]
+
+
+def iter_customer_parquet_batches(source, batch_rows: int = INGEST_BATCH_ROWS) -> Iterator[pa.RecordBatch]:
+    """Stream only the required columns of a Parquet file, nested types intact"""
+    parquet_file = pq.ParquetFile(source)
+    check_columns(parquet_file.schema_arrow.names)
+    yield from parquet_file.iter_batches(batch_size=batch_rows, columns=REQUIRED_COLUMNS)
+
+
+def _arrow_buffer(source) -> pa.Buffer:
+    # Wrap in-memory uploads without copying; memory-map files on disk
+    if hasattr(source, "getbuffer"):
+        return pa.py_buffer(source.getbuffer())
+    return pa.memory_map(source, "r").read_buffer()
+
+
+def iter_customer_arrow_batches(source, batch_rows: int = INGEST_BATCH_ROWS) -> Iterator[pa.RecordBatch]:
+    """Zero-copy batches of a Feather v2 / Arrow IPC file or stream"""
+    buffer = _arrow_buffer(source)
+    try:
+        reader = pa.ipc.open_file(buffer)
+        batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+    except pa.ArrowInvalid:
+        reader = pa.ipc.open_stream(buffer)
+        batches = iter(reader)
+    check_columns(reader.schema.names)
+    for batch in batches:
+        batch = batch.select(REQUIRED_COLUMNS)
+        for start in range(0, batch.num_rows, batch_rows):
+            yield batch.slice(start, batch_rows)
+
+
+def iter_customer_jsonl_batches(source, batch_rows: int = INGEST_BATCH_ROWS,
+                                block_size: int = INGEST_BLOCK_BYTES) -> Iterator[pa.RecordBatch]:
+    """Batches of a JSON Lines file; nested histories stay native lists/structs"""
+    table = pajson.read_json(source, read_options=pajson.ReadOptions(block_size=block_size))
+    check_columns(table.column_names)
+    yield from table.select(REQUIRED_COLUMNS).to_batches(max_chunksize=batch_rows)
+
+
+def iter_customer_csv_batches(source, block_size: int = INGEST_BLOCK_BYTES) -> Iterator[pa.RecordBatch]:
+    """Stream a customer CSV as record batches of roughly ``block_size`` bytes"""
+    try:
+        reader = pacsv.open_csv(
+            source,
+            read_options=pacsv.ReadOptions(block_size=block_size),
+            convert_options=_csv_convert_options(),
+        )
+    except pa.ArrowKeyError as e:
+        raise _missing_csv_column(e) from e
+    yield from reader
+
+
+def _decode_history(value: Any) -> Any:
+    if value is None or value == "":
+        return []
+    if isinstance(value, str):
+        value = _json_loads(value)
+    if not isinstance(value, (list, dict)):
+        raise ValueError(f"expected a JSON list or object, got {type(value).__name__}")
+    return value
+
+
+def decode_batch(batch: Union[pa.Table, pa.RecordBatch],
+                 first_row: int) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Decode and validate one batch, quarantining bad rows instead of failing
+
+    Returns the valid records and one error per bad row: its 1-based data row
+    number (header excluded), the offending column and the reason.
+    """
+    columns = {name: batch.column(name).to_pylist() for name in REQUIRED_COLUMNS}
+    records = []
+    errors = []
+    for offset, customer_id in enumerate(columns["customer_id"]):
+        row_number = first_row + offset + 1
+        if customer_id is None or customer_id == "":
+            errors.append({"row": row_number, "column": "customer_id", "reason": "missing value"})
+            continue
+        record = {"customer_id": customer_id}
+        for column in ("interaction_history", "purchase_history"):
+            try:
+                record[column] = _decode_history(columns[column][offset])
+            except ValueError as e:
+                errors.append({"row": row_number, "column": column, "reason": str(e)})
+                break
+        else:
+            records.append(record)
+    return records, errors
+
+
+def iter_customer_batches(source, file_format: str = "csv") -> Iterator[pa.RecordBatch]:
+    """Record batches holding just the required columns, for any supported format"""
+    if file_format == "csv":
+        return iter_customer_csv_batches(source)
+    if file_format == "parquet":
+        return iter_customer_parquet_batches(source)
+    if file_format == "arrow":
+        return iter_customer_arrow_batches(source)
+    if file_format == "jsonl":
+        return iter_customer_jsonl_batches(source)
+    raise IngestionError(f"Unsupported file format '{file_format}'")
+
+
+def iter_customer_records(source, file_format: str = "csv",
+                          pool: Optional[Executor] = None
+                          ) -> Iterator[Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]:
+    """Stream a customer file as (valid records, row errors), one pair per batch
+
+    With a ``pool`` the blocks are decoded in worker processes while the next
+    ones are read; results are still yielded in file order, and only a few
+    blocks are in flight at once so memory stays bounded.
+    """
+    batches = iter_customer_batches(source, file_format)
+    first_row = 0
+    if pool is None:
+        for batch in batches:
+            yield decode_batch(batch, first_row)
+            first_row += batch.num_rows
+        return
+
+    pending = deque()
+    max_pending = 2 * INGEST_WORKERS
+    for batch in batches:
+        pending.append(pool.submit(decode_batch, batch, first_row))
+        first_row += batch.num_rows
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def _count_lines(source, chunk_bytes: int = 1 << 20) -> int:
+    f = open(source, "rb") if isinstance(source, str) else source
+    try:
+        lines = 0
+        last = b""
+        for chunk in iter(lambda: f.read(chunk_bytes), b""):
+            lines += chunk.count(b"\n")
+            last = chunk
+        return lines + (1 if last and not last.endswith(b"\n") else 0)
+    finally:
+        if f is not source:
+            f.close()
+
+
+def count_customer_rows(source, file_format: str) -> Optional[int]:
+    """Rows in a customer file, known up front for every format but CSV
+
+    Parquet reads it from the footer, Arrow from the batch headers (zero
+    copy) and JSON Lines estimates it from line breaks. CSV returns None:
+    its progress is tracked by bytes read. A file source is rewound after.
+    """
+    try:
+        if file_format == "parquet":
+            return pq.ParquetFile(source).metadata.num_rows
+        if file_format == "arrow":
+            buffer = _arrow_buffer(source)
+            try:
+                reader = pa.ipc.open_file(buffer)
+                return sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+            except pa.ArrowInvalid:
+                return sum(batch.num_rows for batch in pa.ipc.open_stream(buffer))
+        if file_format == "jsonl":
+            return _count_lines(source)
+        return None
+    except (pa.ArrowException, OSError):
+        # Unreadable files are reported by the reader itself
+        return None
+    finally:
+        if hasattr(source, "seek"):
+            source.seek(0)
@@ -0,0 +1,126 @@
+import heapq
+import json
+import math
+import os
+import re
+from collections import Counter
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# Keeps SKU-style tokens such as "sku-1234" or "a1.5" whole
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-_.][a-z0-9]+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def _leaf_values(value: Any) -> Iterator[str]:
+    if isinstance(value, dict):
+        for item in value.values():
+            yield from _leaf_values(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _leaf_values(item)
+    elif value is not None:
+        yield str(value)
+
+
+def customer_tokens(customer: Dict[str, Any]) -> List[str]:
+    """Tokens of a customer's ID and history values (JSON keys are left out)"""
+    text = " ".join(_leaf_values([
+        customer["customer_id"],
+        customer["interaction_history"],
+        customer["purchase_history"],
+    ]))
+    return tokenize(text)
+
+
+class LexicalIndex:
+    """Incrementally updated BM25 inverted index over customer histories"""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.doc_lengths: Dict[int, int] = {}
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def add(self, row: int, customer: Dict[str, Any]) -> None:
+        tokens = customer_tokens(customer)
+        for term, count in Counter(tokens).items():
+            self.postings.setdefault(term, {})[row] = count
+        self.doc_lengths[row] = len(tokens)
+        self.total_length += len(tokens)
+
+    def remove(self, row: int, customer: Dict[str, Any]) -> None:
+        """Drop a row; ``customer`` is the record it was indexed with"""
+        for term in set(customer_tokens(customer)):
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(row, None)
+                if not postings:
+                    del self.postings[term]
+        self.total_length -= self.doc_lengths.pop(row, 0)
+
+    def search(self, query: str, k: int = 10, mask: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """Top ``k`` (row, BM25 score) pairs for a query, best first
+
+        With a boolean ``mask`` over rows only rows set in it are ranked.
+        """
+        n_docs = len(self.doc_lengths)
+        if n_docs == 0:
+            return []
+        average_length = self.total_length / n_docs
+
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for row, tf in postings.items():
+                if mask is not None and not (row < len(mask) and mask[row]):
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[row] / average_length)
+                scores[row] = scores.get(row, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def save(self, directory: str) -> None:
+        terms = list(self.postings)
+        sizes = np.fromiter((len(self.postings[t]) for t in terms), dtype="int64", count=len(terms))
+        rows = np.fromiter(
+            (row for t in terms for row in self.postings[t]), dtype="int64", count=int(sizes.sum())
+        )
+        tfs = np.fromiter(
+            (tf for t in terms for tf in self.postings[t].values()), dtype="int32", count=len(rows)
+        )
+        np.savez(
+            os.path.join(directory, "lexical.npz"),
+            sizes=sizes,
+            rows=rows,
+            tfs=tfs,
+            doc_rows=np.fromiter(self.doc_lengths.keys(), dtype="int64"),
+            doc_lengths=np.fromiter(self.doc_lengths.values(), dtype="int64"),
+        )
+        with open(os.path.join(directory, "lexical_terms.json"), "w", encoding="utf-8") as f:
+            json.dump({"k1": self.k1, "b": self.b, "terms": terms}, f, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, directory: str) -> "LexicalIndex":
+        with open(os.path.join(directory, "lexical_terms.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        index = cls(k1=meta["k1"], b=meta["b"])
+        with np.load(os.path.join(directory, "lexical.npz")) as arrays:
+            rows, tfs = arrays["rows"].tolist(), arrays["tfs"].tolist()
+            offset = 0
+            for term, size in zip(meta["terms"], arrays["sizes"].tolist()):
+                index.postings[term] = dict(zip(rows[offset:offset + size], tfs[offset:offset + size]))
+                offset += size
+            index.doc_lengths = dict(zip(arrays["doc_rows"].tolist(), arrays["doc_lengths"].tolist()))
+        index.total_length = sum(index.doc_lengths.values())
+        return index
@@ -0,0 +1,112 @@
+import atexit
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+import openai
+from langchain_community.chat_models import ChatPerplexity
+from langchain_openai import ChatOpenAI
+
+from config import (
+    LLM_CONNECT_TIMEOUT,
+    LLM_KEEPALIVE_EXPIRY,
+    LLM_MAX_CONNECTIONS,
+    LLM_MAX_KEEPALIVE_CONNECTIONS,
+    LLM_MAX_RETRIES,
+    LLM_READ_TIMEOUT,
+)
+
+PERPLEXITY_BASE_URL = "https://api.perplexity.ai"
+
+_clients: Dict[Tuple, Any] = {}
+_clients_lock = threading.Lock()
+_http_client: Optional[httpx.Client] = None
+_async_http_client: Optional[httpx.AsyncClient] = None
+
+
+def _pool_settings() -> Dict[str, Any]:
+    return {
+        "limits": httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+        ),
+        "timeout": httpx.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+    }
+
+
+def get_http_client() -> httpx.Client:
+    """Keep-alive HTTP connection pool shared by every chat client in the process"""
+    global _http_client
+    with _clients_lock:
+        if _http_client is None:
+            _http_client = httpx.Client(**_pool_settings())
+            atexit.register(_http_client.close)
+    return _http_client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Async counterpart of get_http_client, with the same limits, for ``ainvoke``
+
+    Its pooled connections belong to the event loop that opened them; async
+    callers share one long-lived loop (agent_runtime) or one ``asyncio.run``
+    per process (batch_runner).
+    """
+    global _async_http_client
+    with _clients_lock:
+        if _async_http_client is None:
+            _async_http_client = httpx.AsyncClient(**_pool_settings())
+    return _async_http_client
+
+
+def _build_chat_model(provider: str, model: str, temperature: float, json_mode: bool):
+    timeout = httpx.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT)
+    if provider == "perplexity":
+        api_key = os.environ["PPLX_API_KEY"]
+        chat_model = ChatPerplexity(api_key=api_key, temperature=temperature, model=model)
+        # ChatPerplexity builds its own OpenAI client; swap in one on the shared pool
+        chat_model.client = openai.OpenAI(
+            api_key=api_key,
+            base_url=PERPLEXITY_BASE_URL,
+            http_client=get_http_client(),
+            timeout=timeout,
+            max_retries=LLM_MAX_RETRIES,
+        )
+        return chat_model
+    if provider == "openai":
+        kwargs = {"response_format": {"type": "json_object"}} if json_mode else {}
+        return ChatOpenAI(
+            model=model,
+            temperature=temperature,
+            http_client=get_http_client(),
+            http_async_client=get_async_http_client(),
+            timeout=timeout,
+            max_retries=LLM_MAX_RETRIES,
+            **kwargs
+        )
+    raise ValueError(f"Unknown chat model provider '{provider}'")
+
+
+def get_chat_model(provider: str, model: str, temperature: float = 0.7, json_mode: bool = False):
+    """Process-wide chat client for a provider/model/settings combination
+
+    Clients are built once and reused across reruns and sessions, so every
+    turn goes over already-open pooled connections.
+    """
+    api_key = os.environ.get("PPLX_API_KEY" if provider == "perplexity" else "OPENAI_API_KEY")
+    key = (provider, model, temperature, json_mode, api_key)
+    with _clients_lock:
+        chat_model = _clients.get(key)
+    if chat_model is None:
+        chat_model = _build_chat_model(provider, model, temperature, json_mode)
+        with _clients_lock:
+            chat_model = _clients.setdefault(key, chat_model)
+    return chat_model
+
+
+def chat_model_for_agent(agent: Dict[str, Any]):
+    """Chat client used for an agent: Perplexity for research agents, GPT-4 otherwise"""
+    if agent["type"] == "Research Agent":
+        return get_chat_model("perplexity", "sonar", temperature=0.7)
+    return get_chat_model("openai", "gpt-4", temperature=0.7, json_mode=True)
@@ -2,6 +2,7 @@ import streamlit as st
 from agents import render_agent_creation
 from chat import render_chat_page
 from dotenv import load_dotenv
+from embeddings import warm_up_embedding_model
 import os
 
 # Load environment variables from .env
@@ -278,6 +279,13 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Load the shared embedding model once per server process
+@st.cache_resource(show_spinner="Loading embedding model...")
+def _warm_up_embeddings():
+    return warm_up_embedding_model()
+
+_warm_up_embeddings()
+
 # Sidebar navigation
 st.sidebar.title("Navigation")
 page = st.sidebar.radio(
@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from config import (
+    RESPONSE_CACHE_MAX_ENTRIES,
+    RESPONSE_CACHE_PATH,
+    RESPONSE_CACHE_SIMILARITY,
+    RESPONSE_CACHE_TTL_SECONDS,
+    RESPONSE_CACHE_TTLS,
+)
+from embeddings import get_embedding_model
+
+_caches: Dict[str, "ResponseCache"] = {}
+_caches_lock = threading.Lock()
+
+
+def agent_cache_ttl(agent: Dict[str, Any]) -> float:
+    """Seconds an agent's answers stay valid: its own setting, else its type's, else the default"""
+    if "cache_ttl" in agent:
+        return float(agent["cache_ttl"])
+    return float(RESPONSE_CACHE_TTLS.get(agent["type"], RESPONSE_CACHE_TTL_SECONDS))
+
+
+class ResponseCache:
+    """Two-tier cache of agent answers backed by SQLite
+
+    The exact tier is keyed on the agent's prompt template, the request
+    context and the user message. The semantic tier reuses the MiniLM
+    embedding model: within the same template and context, a message whose
+    embedding is at least ``similarity`` close to a cached one reuses its
+    answer. Entries expire after their agent's TTL and are evicted
+    least-recently-used beyond ``max_entries``.
+    """
+
+    def __init__(self, path: str, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+                 similarity: float = RESPONSE_CACHE_SIMILARITY):
+        self.path = path
+        self.max_entries = max_entries
+        self.similarity = similarity
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, scope TEXT NOT NULL, embedding BLOB NOT NULL, "
+            "response TEXT NOT NULL, expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_scope ON responses (scope)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_scope(prompt_template: str, context: Dict[str, Any]) -> str:
+        """Hash of everything but the message; semantic matches never cross scopes"""
+        payload = json.dumps([prompt_template, context], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def make_key(scope: str, message: str) -> str:
+        return hashlib.sha256(f"{scope}\0{message}".encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _embed(message: str) -> np.ndarray:
+        vector = get_embedding_model().encode([message])[0]
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def get(self, prompt_template: str, context: Dict[str, Any],
+            message: str) -> Optional[Dict[str, Any]]:
+        """Cached answer for a request, or None; exact matches skip the embedding model"""
+        scope = self.make_scope(prompt_template, context)
+        key = self.make_key(scope, message)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response FROM responses WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row is not None:
+                self._touch(key, now)
+                self.exact_hits += 1
+                return json.loads(row[0])
+            candidates = self._conn.execute(
+                "SELECT key, embedding, response FROM responses WHERE scope = ? AND expires_at > ?",
+                (scope, now)
+            ).fetchall()
+        if candidates:
+            query = self._embed(message)
+            embeddings = np.stack([np.frombuffer(blob, dtype="float32") for _, blob, _ in candidates])
+            scores = embeddings @ query
+            best = int(np.argmax(scores))
+            if scores[best] >= self.similarity:
+                with self._lock:
+                    self._touch(candidates[best][0], now)
+                    self.semantic_hits += 1
+                return json.loads(candidates[best][2])
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, prompt_template: str, context: Dict[str, Any], message: str,
+            response: Dict[str, Any], ttl: float) -> None:
+        """Store an answer and evict expired and least recently used entries"""
+        scope = self.make_scope(prompt_template, context)
+        embedding = self._embed(message).astype("float32").tobytes()
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(key, scope, embedding, response, expires_at, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                (self.make_key(scope, message), scope, embedding, json.dumps(response), now + ttl, now)
+            )
+            self._conn.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY last_used LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+            self._conn.commit()
+
+    def _touch(self, key: str, now: float) -> None:
+        self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+        self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit counts and hit rate since the process started"""
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0,
+        }
+
+
+def get_response_cache(path: str = RESPONSE_CACHE_PATH) -> Optional[ResponseCache]:
+    """Get the process-wide response cache, or None when caching is disabled"""
+    if not path:
+        return None
+    with _caches_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            cache = ResponseCache(path)
+            _caches[path] = cache
+    return cache
@@ -0,0 +1,164 @@
+import json
+from typing import Iterable, Iterator, List
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class ResponseFieldParser:
+    """Incrementally pull one top-level string field out of streamed JSON
+
+    Agents answer with JSON such as ``{"response": "...", ...}``. ``feed``
+    takes raw chunks as they arrive and returns the newly decoded part of
+    the field's value, so it can be shown before the JSON is complete.
+    Output that does not start with ``{`` (plain text or a fenced block with
+    prose) is passed through unchanged.
+    """
+
+    def __init__(self, field: str = "response"):
+        self.field = field
+        self.buffer = ""
+        self._pos = 0
+        self._state = "start"
+        self._depth = 0
+        self._in_string = False
+        self._string_start = 0
+        self._key = None
+
+    def feed(self, chunk: str) -> str:
+        self.buffer += chunk
+        out: List[str] = []
+        buffer = self.buffer
+        i = self._pos
+        while i < len(buffer):
+            state = self._state
+            char = buffer[i]
+
+            if state == "start":
+                if buffer.startswith("```", i):
+                    # Skip a ```json fence line; wait until it is complete
+                    end = buffer.find("\n", i)
+                    if end < 0:
+                        break
+                    i = end + 1
+                    continue
+                if "```".startswith(buffer[i:]):
+                    # One or two backticks so far: could still open a fence
+                    break
+                if char.isspace():
+                    i += 1
+                    continue
+                self._state = "object" if char == "{" else "plain"
+                continue
+
+            if state == "plain":
+                out.append(buffer[i:])
+                i = len(buffer)
+                break
+
+            if state == "object":
+                if self._in_string:
+                    if char == "\\":
+                        if i + 1 >= len(buffer):
+                            break
+                        i += 2
+                        continue
+                    if char == '"':
+                        self._in_string = False
+                        if self._depth == 1:
+                            self._key = buffer[self._string_start + 1:i]
+                elif char == '"':
+                    self._in_string = True
+                    self._string_start = i
+                elif char in "{[":
+                    self._depth += 1
+                    self._key = None
+                elif char in "}]":
+                    self._depth -= 1
+                    self._key = None
+                elif char == ":" and self._depth == 1 and self._key == self.field:
+                    self._state = "value_start"
+                elif not char.isspace():
+                    self._key = None
+                i += 1
+                continue
+
+            if state == "value_start":
+                if char.isspace():
+                    i += 1
+                    continue
+                # A non-string value cannot be streamed; the caller parses it at the end
+                self._state = "value" if char == '"' else "done"
+                i += 1
+                continue
+
+            if state == "value":
+                if char == '"':
+                    self._state = "done"
+                    i += 1
+                    continue
+                if char != "\\":
+                    end = i
+                    while end < len(buffer) and buffer[end] not in '"\\':
+                        end += 1
+                    out.append(buffer[i:end])
+                    i = end
+                    continue
+                decoded, length = self._decode_escape(buffer, i)
+                if decoded is None:
+                    break
+                out.append(decoded)
+                i += length
+                continue
+
+            # done: the rest is parsed once the stream ends
+            i = len(buffer)
+
+        self._pos = i
+        return "".join(out)
+
+    @staticmethod
+    def _decode_escape(buffer: str, i: int):
+        """Decode the escape at ``i``; (None, 0) if it is not complete yet"""
+        if i + 1 >= len(buffer):
+            return None, 0
+        kind = buffer[i + 1]
+        if kind != "u":
+            return _ESCAPES.get(kind, kind), 2
+        if i + 6 > len(buffer):
+            return None, 0
+        try:
+            code = int(buffer[i + 2:i + 6], 16)
+        except ValueError:
+            return buffer[i:i + 6], 6
+        length = 6
+        # A high surrogate must be decoded together with its low half
+        if 0xD800 <= code <= 0xDBFF:
+            if i + 12 > len(buffer):
+                return None, 0
+            if buffer.startswith("\\u", i + 6):
+                length = 12
+        return json.loads(f'"{buffer[i:i + length]}"'), length
+
+
+def stream_response_field(chunks: Iterable[str], parser: ResponseFieldParser) -> Iterator[str]:
+    """Yield the visible text of a streamed answer; ``parser.buffer`` keeps the raw output"""
+    for chunk in chunks:
+        text = parser.feed(chunk)
+        if text:
+            yield text
+
+
+def parse_response(content: str) -> dict:
+    """Parse a complete agent answer into a dict with at least a "response" key"""
+    text = content.strip()
+    if text.startswith("```"):
+        # ```json ... ``` fenced answers
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        text = text.rsplit("```", 1)[0]
+    try:
+        parsed = json.loads(text)
+    except json.JSONDecodeError:
+        return {"response": content}
+    if not isinstance(parsed, dict):
+        return {"response": parsed if isinstance(parsed, str) else content}
+    return parsed
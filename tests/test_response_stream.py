@@ -0,0 +1,37 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from response_stream import ResponseFieldParser, parse_response  # noqa: E402
+
+ANSWER = {"response": "Churn risk is high — offer a \"loyalty\" discount.\nCall within 3 days.",
+          "risk": 0.8}
+OBJECT = json.dumps(ANSWER)
+FENCED = f"```json\n{OBJECT}\n```"
+
+
+def feed_in_chunks(text, size):
+    parser = ResponseFieldParser()
+    streamed = "".join(parser.feed(text[i:i + size]) for i in range(0, len(text), size))
+    return streamed, parser.buffer
+
+
+@pytest.mark.parametrize("text", [OBJECT, FENCED, "  \n" + FENCED], ids=["object", "fenced", "leading-space"])
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 1000])
+def test_streams_only_the_response_field(text, size):
+    streamed, raw = feed_in_chunks(text, size)
+    assert streamed == ANSWER["response"]
+    assert raw == text
+    assert parse_response(raw) == ANSWER
+
+
+@pytest.mark.parametrize("size", [1, 2, 1000])
+def test_plain_text_passes_through(size):
+    text = "`pip install` fixes it, then restart."
+    streamed, _ = feed_in_chunks(text, size)
+    assert streamed == text
+    assert parse_response(text) == {"response": text}
@@ -0,0 +1,112 @@
+import hashlib
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("faiss")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import vector_store  # noqa: E402
+from vector_store import MIN_PQ_TRAINING_ROWS, VectorStore  # noqa: E402
+
+DIMENSION = 64
+
+
+class HashEmbeddingModel:
+    """Deterministic unit vectors per text, so tests need no model weights"""
+
+    dimension = DIMENSION
+
+    def encode(self, texts, **kwargs):
+        vectors = np.stack([
+            np.random.default_rng(int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:16], 16))
+            .standard_normal(DIMENSION)
+            for text in texts
+        ]).astype("float32")
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def encode_bulk(self, texts):
+        return self.encode(texts)
+
+    def encode_multi_process(self, texts, workers):
+        return self.encode(texts)
+
+
+@pytest.fixture(autouse=True)
+def hash_embeddings(monkeypatch, tmp_path):
+    monkeypatch.setattr(vector_store, "get_embedding_model", lambda model_name: HashEmbeddingModel())
+    monkeypatch.setattr(vector_store, "get_embedding_cache", lambda: None)
+    monkeypatch.setattr(vector_store, "VECTOR_STORE_DIR", str(tmp_path))
+
+
+def make_customers(n, start=0, product="widget"):
+    return [
+        {
+            "customer_id": f"C{i:06d}",
+            "interaction_history": [{"date": "2024-03-01", "channel": "email", "note": f"asked about {i}"}],
+            "purchase_history": [{"date": "2024-02-01", "product": product, "amount": i % 97}],
+        }
+        for i in range(start, start + n)
+    ]
+
+
+def build_store(mode, n_rows):
+    store = VectorStore(index_mode=mode)
+    store.add_customers(make_customers(n_rows))
+    return store
+
+
+def queries(store, customers):
+    return [store._create_text_representation(customer) for customer in customers]
+
+
+def result_ids(results):
+    return [[customer["customer_id"] for customer in hits] for hits in results]
+
+
+@pytest.mark.parametrize("mmap", [True, False], ids=["mmap", "in-memory"])
+@pytest.mark.parametrize("mode,n_rows", [
+    ("flat", 500),
+    ("hnsw", 500),
+    ("ivf_flat", 2000),
+    ("ivf_pq", MIN_PQ_TRAINING_ROWS),
+])
+def test_snapshot_round_trip(mode, n_rows, mmap):
+    store = build_store(mode, n_rows)
+    assert store.active_index_mode == mode
+    texts = queries(store, make_customers(20, start=n_rows // 2))
+    before = result_ids(store.search_similar_customers_batch(texts, k=5))
+
+    store.save_snapshot("round-trip")
+    loaded = VectorStore.load_snapshot("round-trip", mmap=mmap)
+
+    assert loaded is not None
+    assert len(loaded) == n_rows
+    assert loaded.active_index_mode == mode
+    assert loaded.get_customer(f"C{n_rows // 2:06d}") == store.get_customer(f"C{n_rows // 2:06d}")
+    assert result_ids(loaded.search_similar_customers_batch(texts, k=5)) == before
+
+
+def test_ivf_pq_needs_enough_rows_for_its_codebooks():
+    assert vector_store.resolve_index_mode("ivf_pq", MIN_PQ_TRAINING_ROWS - 1) == "ivf_flat"
+    assert vector_store.resolve_index_mode("ivf_pq", MIN_PQ_TRAINING_ROWS) == "ivf_pq"
+
+
+@pytest.mark.parametrize("mode,n_rows", [("flat", 500), ("hnsw", 500), ("ivf_flat", 2000)])
+def test_upsert_after_mmap_load(mode, n_rows):
+    build_store(mode, n_rows).save_snapshot("reloaded")
+    store = VectorStore.load_snapshot("reloaded", mmap=True)
+
+    changed = make_customers(5, product="gadget")
+    added = make_customers(5, start=n_rows)
+    result = store.upsert_customers(changed + added)
+
+    assert result == {"inserted": 5, "updated": 5}
+    assert len(store) == n_rows + 5
+    assert store.get_customer("C000000")["purchase_history"][0]["product"] == "gadget"
+    for customer in changed + added:
+        hits = store.search_similar_customers(store._create_text_representation(customer), k=1)
+        assert hits[0]["customer_id"] == customer["customer_id"]
@@ -1,15 +1,214 @@
 import numpy as np
-from sentence_transformers import SentenceTransformer
 import faiss
 import json
-from typing import List, Dict, Any
+import hashlib
+import math
+import os
+import shutil
+import time
+from itertools import islice
+from typing import Callable, Iterable, List, Dict, Any, Optional, Tuple
+from config import (
+    AUTO_IVF_MIN_ROWS,
+    AUTO_IVFPQ_MIN_ROWS,
+    EMBED_BATCH_SIZE,
+    EMBED_WORKERS,
+    EMBEDDING_MODEL_NAME,
+    FILTER_EXACT_MAX_ROWS,
+    HNSW_EF_SEARCH,
+    HNSW_M,
+    HYBRID_RRF_K,
+    IVF_NPROBE,
+    LEXICAL_SHORT_CIRCUIT_RATIO,
+    NEIGHBOUR_K,
+    TABLE_COMPACT_DEAD_FRACTION,
+    VECTOR_DTYPE,
+    VECTOR_INDEX_MODE,
+    VECTOR_STORE_DIR,
+)
+from customer_attributes import AttributeIndex
+from customer_table import CustomerTable, deep_sizeof
+from lexical_index import LexicalIndex
+from embeddings import EmbeddingCache, get_embedding_cache, get_embedding_model
+
+SNAPSHOT_FORMAT_VERSION = 7
+SNAPSHOT_INDEX_FILE = "index.faiss"
+SNAPSHOT_NEIGHBOURS_FILE = "neighbours.npy"
+SNAPSHOT_META_FILE = "meta.json"
+
+INDEX_MODES = ("auto", "flat", "ivf_flat", "hnsw", "ivf_pq")
+IVF_MODES = ("ivf_flat", "ivf_pq")
+VECTOR_DTYPES = ("float32", "float16", "int8")
+# FAISS encoding used for full vectors at each storage precision
+_VECTOR_ENCODINGS = {"float32": "Flat", "float16": "SQfp16", "int8": "SQ8"}
+# Below this many vectors the trained modes fall back to an exact flat index
+MIN_TRAINING_ROWS = 1000
+# 8-bit PQ codebooks need ~39 training points for each of their 256 centroids;
+# below that IVF-PQ falls back to IVF-Flat
+MIN_PQ_TRAINING_ROWS = 256 * 39
+# Retrain IVF indexes once the corpus has grown this much since training
+RETRAIN_GROWTH_FACTOR = 4
+
+
+def dataset_fingerprint(content: bytes) -> str:
+    """Fingerprint raw dataset content for snapshot lookup"""
+    return hashlib.sha256(content).hexdigest()[:32]
+
+
+def file_fingerprint(path: str, chunk_bytes: int = 1 << 20) -> str:
+    """dataset_fingerprint of a file on disk, hashed without reading it all into memory"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_bytes), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:32]
+
+
+def snapshot_path(fingerprint: str, model_name: str = EMBEDDING_MODEL_NAME) -> str:
+    """Directory holding the snapshot for a dataset/model pair"""
+    return os.path.join(VECTOR_STORE_DIR, f"{model_name.replace('/', '_')}-{fingerprint}")
+
+
+def resolve_index_mode(mode: str, n_vectors: int) -> str:
+    """Pick the concrete index backend for a requested mode and corpus size"""
+    if mode not in INDEX_MODES:
+        raise ValueError(f"Unknown index mode '{mode}', expected one of {INDEX_MODES}")
+    if mode == "auto":
+        if n_vectors >= AUTO_IVFPQ_MIN_ROWS:
+            mode = "ivf_pq"
+        elif n_vectors >= AUTO_IVF_MIN_ROWS:
+            mode = "ivf_flat"
+        else:
+            mode = "flat"
+    if mode == "ivf_pq" and n_vectors < MIN_PQ_TRAINING_ROWS:
+        mode = "ivf_flat"
+    if mode in IVF_MODES and n_vectors < MIN_TRAINING_ROWS:
+        return "flat"
+    return mode
+
+
+def build_index(mode: str, dimension: int, n_vectors: int = 0,
+                nprobe: int = IVF_NPROBE, ef_search: int = HNSW_EF_SEARCH,
+                vector_dtype: str = "float32") -> faiss.Index:
+    """Create an empty FAISS index for a concrete mode that takes row numbers as ids
+
+    IVF indexes store ids in their inverted lists and remove them there, with
+    a hash-table direct map for reconstruct; flat and HNSW indexes are wrapped
+    in an ``IndexIDMap2``.
+    """
+    encoding = _VECTOR_ENCODINGS[vector_dtype]
+    if mode == "flat":
+        factory = encoding
+    elif mode == "hnsw":
+        factory = f"HNSW{HNSW_M}" if encoding == "Flat" else f"HNSW{HNSW_M},{encoding}"
+    elif mode in IVF_MODES:
+        # ~4*sqrt(n) lists, but keep at least 39 training points per centroid
+        nlist = max(1, min(int(4 * math.sqrt(n_vectors)), n_vectors // 39))
+        if mode == "ivf_flat":
+            factory = f"IVF{nlist},{encoding}"
+        else:
+            factory = f"IVF{nlist},PQ{_pq_subquantizers(dimension)}"
+    else:
+        raise ValueError(f"Cannot build index for mode '{mode}'")
+
+    index = faiss.index_factory(dimension, factory)
+    set_search_parameters(index, mode, nprobe=nprobe, ef_search=ef_search)
+    if mode in IVF_MODES:
+        faiss.extract_index_ivf(index).set_direct_map_type(faiss.DirectMap.Hashtable)
+        return index
+    return faiss.IndexIDMap2(index)
+
+
+def set_search_parameters(index: faiss.Index, mode: str,
+                          nprobe: int = IVF_NPROBE, ef_search: int = HNSW_EF_SEARCH) -> None:
+    """Apply the recall/speed knob of an approximate index"""
+    params = faiss.ParameterSpace()
+    if mode in IVF_MODES:
+        params.set_index_parameter(index, "nprobe", nprobe)
+    elif mode == "hnsw":
+        params.set_index_parameter(index, "efSearch", ef_search)
+
+
+def search_parameters(mode: str, selector: faiss.IDSelector) -> faiss.SearchParameters:
+    """Per-query parameters restricting a search of ``mode`` to ``selector``"""
+    if mode in IVF_MODES:
+        return faiss.SearchParametersIVF(sel=selector, nprobe=IVF_NPROBE)
+    if mode == "hnsw":
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=HNSW_EF_SEARCH)
+    return faiss.SearchParameters(sel=selector)
+
+
+def index_nbytes(index: faiss.Index) -> int:
+    """Approximate memory held by an index, from its code size rather than a serialized copy"""
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIDMap2):
+        # int64 id per vector plus the reverse hash map
+        return 3 * 8 * index.ntotal + index_nbytes(index.index)
+    if isinstance(index, faiss.IndexHNSW):
+        # int32 links, 2*M per vector on the base layer (upper layers add ~1/M)
+        return 4 * index.hnsw.nb_neighbors(0) * index.ntotal + index_nbytes(index.storage)
+    if isinstance(index, faiss.IndexIVF):
+        direct_map = 0 if index.direct_map.type == faiss.DirectMap.NoMap else 2 * 8 * index.ntotal
+        return (index.code_size + 8) * index.ntotal + direct_map + index_nbytes(index.quantizer)
+    # Flat, scalar-quantized and PQ codes
+    return getattr(index, "code_size", 4 * index.d) * index.ntotal
+
+
+def _pq_subquantizers(dimension: int) -> int:
+    # 8-dim sub-vectors (48 bytes/vector for MiniLM); must divide the dimension
+    for m in (dimension // 8, 64, 48, 32, 16, 8, 4, 2, 1):
+        if m and dimension % m == 0:
+            return m
+    return 1
+
 
 class VectorStore:
-    def __init__(self):
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
-        self.dimension = 384  # Output dimension of all-MiniLM-L6-v2
-        self.index = faiss.IndexFlatL2(self.dimension)
-        self.stored_data = []
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME, index_mode: str = VECTOR_INDEX_MODE,
+                 vector_dtype: str = VECTOR_DTYPE):
+        if vector_dtype not in VECTOR_DTYPES:
+            raise ValueError(f"Unknown vector dtype '{vector_dtype}', expected one of {VECTOR_DTYPES}")
+        # Shared across sessions; weights are loaded on the first encode
+        self.model = get_embedding_model(model_name)
+        self.model_name = model_name
+        self.dimension = self.model.dimension
+        self.embedding_cache = get_embedding_cache()
+        self.index_mode = index_mode
+        self.vector_dtype = vector_dtype
+        self.active_index_mode = resolve_index_mode(index_mode, 0)
+        # FAISS ids are row numbers, so they stay stable across upserts
+        self.index = build_index(self.active_index_mode, self.dimension, vector_dtype=vector_dtype)
+        self._table = CustomerTable()
+        self._attributes = AttributeIndex()
+        self._lexical = LexicalIndex()
+        self._id_to_row: Dict[str, int] = {}
+        self._trained_on = 0
+        self._index_stale = False
+        # Optional rows x NEIGHBOUR_K matrix of nearest rows (-1 padded)
+        self._neighbours: Optional[np.ndarray] = None
+        self.fingerprint = None
+        self._read_only = False
+
+    @property
+    def stored_data(self) -> List[Dict[str, Any]]:
+        """All live customer records, in row order (materializes every row)"""
+        return list(self._table.iter_records())
+
+    def __len__(self) -> int:
+        return len(self._id_to_row)
+
+    @staticmethod
+    def _customer_key(customer_id: Any) -> str:
+        # CSV ids may be parsed as ints while lookups arrive as strings
+        return str(customer_id)
+
+    def get_customer(self, customer_id: Any) -> Optional[Dict[str, Any]]:
+        """Look up a customer record by ID"""
+        row = self._id_to_row.get(self._customer_key(customer_id))
+        return None if row is None else self._table.get(row)
+
+    def head(self, n: int = 5) -> List[Dict[str, Any]]:
+        """The first ``n`` live customer records"""
+        return self._table.records(self._live_rows()[:n])
 
     def _create_text_representation(self, customer_data: Dict[str, Any]) -> str:
         """Create a textual representation of customer data for embedding"""
@@ -19,63 +218,608 @@ class VectorStore:
             f"Purchase History: {json.dumps(customer_data['purchase_history'])}"
         )
 
-    def add_customers(self, customers: List[Dict[str, Any]]) -> None:
-        """Add customer data to the vector store"""
+    def _ensure_writable(self) -> None:
+        """Copy a memory-mapped index into RAM before mutating it"""
+        if self._read_only:
+            # clone_index of a mapped index still views the file, so round-trip
+            # through a serialized copy to get one that owns its data
+            self.index = faiss.deserialize_index(faiss.serialize_index(self.index))
+            set_search_parameters(self.index, self.active_index_mode)
+            self._table.make_writable()
+            if self._neighbours is not None:
+                self._neighbours = np.array(self._neighbours)
+            self._read_only = False
+
+    def _dense(self, rows: np.ndarray) -> np.ndarray:
+        """Vectors of ``rows`` as contiguous float32, decoded from the index"""
+        rows = np.ascontiguousarray(rows, dtype="int64")
+        if len(rows) == 0:
+            return np.zeros((0, self.dimension), dtype="float32")
+        return np.ascontiguousarray(self.index.reconstruct_batch(rows), dtype="float32")
+
+    def _training_vectors(self, rows: np.ndarray) -> np.ndarray:
+        """Vectors of ``rows`` to retrain on: decoded, or re-embedded when the codes are PQ"""
+        if self.active_index_mode != "ivf_pq":
+            return self._dense(rows)
+        # PQ codes are too coarse to train a new index on; the embedding cache
+        # makes re-encoding the stored records cheap
+        vectors = np.empty((len(rows), self.dimension), dtype="float32")
+        for start in range(0, len(rows), EMBED_BATCH_SIZE):
+            records = self._table.records(rows[start:start + EMBED_BATCH_SIZE])
+            vectors[start:start + len(records)] = self._encode(
+                [self._create_text_representation(record) for record in records]
+            )
+        return vectors
+
+    def _live_rows(self) -> np.ndarray:
+        return np.fromiter(self._id_to_row.values(), dtype="int64", count=len(self._id_to_row))
+
+    def _needs_rebuild(self) -> bool:
+        mode = resolve_index_mode(self.index_mode, len(self))
+        if mode != self.active_index_mode or not self.index.is_trained:
+            return True
+        if self._trained_on:
+            return len(self) > RETRAIN_GROWTH_FACTOR * self._trained_on
+        return False
+
+    def _rebuild_index(self, fresh_rows: Optional[List[int]] = None,
+                       fresh_vectors: Optional[np.ndarray] = None) -> None:
+        """Build (and train) a fresh index over every live vector
+
+        ``fresh_rows`` carry new vectors that the current index does not hold yet.
+        """
+        rows = np.sort(self._live_rows())
+        vectors = np.empty((len(rows), self.dimension), dtype="float32")
+        indexed = np.ones(len(rows), dtype=bool)
+        if fresh_rows:
+            positions = np.searchsorted(rows, fresh_rows)
+            vectors[positions] = fresh_vectors
+            indexed[positions] = False
+        if indexed.any():
+            vectors[indexed] = self._training_vectors(rows[indexed])
+        mode = resolve_index_mode(self.index_mode, len(rows))
+        index = build_index(mode, self.dimension, len(rows), vector_dtype=self.vector_dtype)
+        # Only trained encodings (IVF, SQ8) need retraining as the corpus grows
+        self._trained_on = 0
+        if not index.is_trained:
+            index.train(vectors)
+            self._trained_on = len(rows)
+        if len(rows):
+            index.add_with_ids(vectors, rows)
+        self.index = index
+        self.active_index_mode = mode
+        self._index_stale = False
+
+    def _prepare_for_search(self) -> None:
+        # HNSW cannot delete, so updates there are applied by a lazy rebuild
+        if self._index_stale:
+            self._ensure_writable()
+            self._rebuild_index()
+
+    def _encode(self, texts: List[str], workers: int = 0) -> np.ndarray:
+        """Embed texts, running the model only on those missing from the cache"""
+        if self.embedding_cache is None:
+            return self._run_model(texts, workers)
+
+        keys = [EmbeddingCache.make_key(self.model_name, text) for text in texts]
+        cached = self.embedding_cache.get_many(keys)
+        embeddings = np.empty((len(texts), self.dimension), dtype="float32")
+        missing = []
+        for position, key in enumerate(keys):
+            vector = cached.get(key)
+            if vector is None:
+                missing.append(position)
+            else:
+                embeddings[position] = vector
+
+        if missing:
+            fresh = self._run_model([texts[position] for position in missing], workers)
+            embeddings[missing] = fresh
+            self.embedding_cache.put_many([keys[position] for position in missing], fresh)
+        return embeddings
+
+    def _run_model(self, texts: List[str], workers: int = 0) -> np.ndarray:
+        if workers > 1:
+            return self.model.encode_multi_process(texts, workers)
+        return self.model.encode_bulk(texts)
+
+    def add_customers(self, customers: Iterable[Dict[str, Any]],
+                      batch_size: int = EMBED_BATCH_SIZE,
+                      workers: int = EMBED_WORKERS,
+                      progress_callback: Optional[Callable[[int, Optional[int], float], None]] = None
+                      ) -> Dict[str, Any]:
+        """Stream customers into the store in bounded batches, replacing existing IDs
+
+        Each batch is encoded (optionally across ``workers`` processes) and added
+        to the index before the next one is read, so memory stays proportional to
+        ``batch_size``. ``progress_callback(rows_done, total_rows, rows_per_second)``
+        is called after every batch; ``total_rows`` is None for unsized iterables.
+        """
+        total = len(customers) if hasattr(customers, "__len__") else None
+        iterator = iter(customers)
+        stats = {"rows": 0, "inserted": 0, "updated": 0, "seconds": 0.0, "rows_per_second": 0.0}
+        start = time.perf_counter()
+
+        while True:
+            batch = list(islice(iterator, batch_size))
+            if not batch:
+                break
+            result = self.upsert_customers(batch, workers=workers)
+            stats["rows"] += len(batch)
+            stats["inserted"] += result["inserted"]
+            stats["updated"] += result["updated"]
+            stats["seconds"] = time.perf_counter() - start
+            stats["rows_per_second"] = stats["rows"] / stats["seconds"] if stats["seconds"] else 0.0
+            if progress_callback is not None:
+                progress_callback(stats["rows"], total, stats["rows_per_second"])
+
+        return stats
+
+    def upsert_customers(self, customers: List[Dict[str, Any]], workers: int = 0) -> Dict[str, int]:
+        """Insert new customers and replace the vectors of existing ones in place"""
         if not customers:
-            return
+            return {"inserted": 0, "updated": 0}
+
+        # Last record wins when an ID repeats within the batch
+        latest = {self._customer_key(c["customer_id"]): c for c in customers}
+        customers = list(latest.values())
 
         # Create text representations
         texts = [self._create_text_representation(customer) for customer in customers]
-        
+
         # Generate embeddings
-        embeddings = self.model.encode(texts)
-        
-        # Add to FAISS index
-        self.index.add(np.array(embeddings).astype('float32'))
-        
-        # Store original data
-        self.stored_data.extend(customers)
-
-    def search_similar_customers(self, query_text: str, k: int = 5) -> List[Dict[str, Any]]:
-        """Search for similar customers based on a query"""
-        if not self.stored_data:
-            return []
+        embeddings = self._encode(texts, workers)
+
+        self._ensure_writable()
+
+        # Existing customers keep their row (and FAISS id); new ones get the next row
+        rows = []
+        updated = []
+        for key in latest:
+            row = self._id_to_row.get(key)
+            if row is None:
+                row = self._table.append_row()
+                self._id_to_row[key] = row
+            else:
+                updated.append(row)
+            rows.append(row)
+        updated_rows = set(updated)
+
+        for row, customer in zip(rows, customers):
+            if row in updated_rows:
+                previous = self._table.get(row)
+                self._attributes.remove(row, previous)
+                self._lexical.remove(row, previous)
+            self._table.set(row, customer)
+            self._attributes.set(row, customer)
+            self._lexical.add(row, customer)
+        self._neighbours = None
+
+        if self._needs_rebuild():
+            # Switching backend or (re)training covers this batch as well
+            self._rebuild_index(rows, embeddings)
+        elif updated and self.active_index_mode == "hnsw":
+            # HNSW cannot delete: the new vectors shadow the old ones in the
+            # id map until the lazy rebuild drops them
+            self.index.add_with_ids(embeddings, np.array(rows, dtype="int64"))
+            self._index_stale = True
+        else:
+            if updated:
+                self.index.remove_ids(np.array(updated, dtype="int64"))
+            self.index.add_with_ids(embeddings, np.array(rows, dtype="int64"))
+
+        self._maybe_compact()
+        return {"inserted": len(rows) - len(updated), "updated": len(updated)}
+
+    def remove_customers(self, customer_ids: List[Any]) -> int:
+        """Remove customers and their vectors; returns how many were removed"""
+        self._ensure_writable()
+        rows = []
+        for customer_id in customer_ids:
+            row = self._id_to_row.pop(self._customer_key(customer_id), None)
+            if row is not None:
+                previous = self._table.get(row)
+                self._attributes.remove(row, previous)
+                self._lexical.remove(row, previous)
+                self._table.delete(row)
+                rows.append(row)
+
+        if rows:
+            self._neighbours = None
+            if self.active_index_mode == "hnsw":
+                self._index_stale = True
+            else:
+                self.index.remove_ids(np.array(rows, dtype="int64"))
+            self._maybe_compact()
+        return len(rows)
+
+    def _maybe_compact(self) -> None:
+        # Rewrites append to the table, so reclaim the old bytes once they add up
+        if self._table.dead_fraction > TABLE_COMPACT_DEAD_FRACTION:
+            self._table.compact()
+
+    def save(self, directory: str) -> None:
+        """Write the FAISS index, customer columns and metadata to disk"""
+        self._prepare_for_search()
+        parent = os.path.dirname(os.path.abspath(directory))
+        os.makedirs(parent, exist_ok=True)
+        staging = f"{directory}.tmp-{os.getpid()}"
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+
+        faiss.write_index(self.index, os.path.join(staging, SNAPSHOT_INDEX_FILE))
+        self._table.save(staging)
+        self._attributes.save(staging, len(self._table))
+        self._lexical.save(staging)
+        if self._neighbours is not None:
+            np.save(os.path.join(staging, SNAPSHOT_NEIGHBOURS_FILE), self._neighbours)
+        meta = {
+            "format_version": SNAPSHOT_FORMAT_VERSION,
+            "model_name": self.model_name,
+            "dimension": self.dimension,
+            "count": len(self),
+            "index_mode": self.index_mode,
+            "active_index_mode": self.active_index_mode,
+            "vector_dtype": self.vector_dtype,
+            "trained_on": self._trained_on,
+            "fingerprint": self.fingerprint,
+            "created_at": time.time(),
+        }
+        with open(os.path.join(staging, SNAPSHOT_META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+        # Swap the finished snapshot into place so readers never see a partial one
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(staging, directory)
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> "VectorStore":
+        """Load a snapshot; with mmap the index pages are shared between processes"""
+        with open(os.path.join(directory, SNAPSHOT_META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot format: {meta.get('format_version')}")
+
+        store = cls(model_name=meta["model_name"], index_mode=meta["index_mode"],
+                    vector_dtype=meta["vector_dtype"])
+        if store.dimension != meta["dimension"]:
+            raise ValueError(
+                f"Snapshot dimension {meta['dimension']} does not match model ({store.dimension})"
+            )
+
+        flags = 0
+        if mmap:
+            # IO_FLAG_MMAP_IFC where available; combined with IO_FLAG_MMAP it fails on IVF indexes
+            flags = faiss.IO_FLAG_READ_ONLY | getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+        store.index = faiss.read_index(os.path.join(directory, SNAPSHOT_INDEX_FILE), flags)
+        neighbours_path = os.path.join(directory, SNAPSHOT_NEIGHBOURS_FILE)
+        if os.path.exists(neighbours_path):
+            store._neighbours = np.load(neighbours_path, mmap_mode="r" if mmap else None)
+        store._read_only = mmap
+        store.active_index_mode = meta["active_index_mode"]
+        store._trained_on = meta["trained_on"]
+        set_search_parameters(store.index, store.active_index_mode)
+        store._table = CustomerTable.load(directory, mmap=mmap)
+        store._attributes = AttributeIndex.load(directory)
+        store._lexical = LexicalIndex.load(directory)
+        store._id_to_row = {
+            cls._customer_key(store._table.get_field(row, "customer_id")): int(row)
+            for row in store._table.live_rows()
+        }
+        store.fingerprint = meta.get("fingerprint")
+        return store
+
+    def save_snapshot(self, fingerprint: str) -> str:
+        """Save under the snapshot directory for a dataset fingerprint"""
+        self.fingerprint = fingerprint
+        directory = snapshot_path(fingerprint, self.model_name)
+        self.save(directory)
+        return directory
+
+    @classmethod
+    def load_snapshot(cls, fingerprint: str, model_name: str = EMBEDDING_MODEL_NAME,
+                      mmap: bool = True) -> Optional["VectorStore"]:
+        """Load the snapshot for a dataset fingerprint, or None if there is none"""
+        directory = snapshot_path(fingerprint, model_name)
+        if not os.path.exists(os.path.join(directory, SNAPSHOT_META_FILE)):
+            return None
+        try:
+            return cls.load(directory, mmap=mmap)
+        except ValueError:
+            # Written by an older format or another model; it will be rebuilt
+            return None
+
+    def _filter_mask(self, filters: Dict[str, Any]) -> np.ndarray:
+        """Boolean mask of the live rows matching ``filters``"""
+        n_rows = len(self._table)
+        return self._attributes.evaluate(filters, n_rows) & self._table.live[:n_rows]
+
+    def _search_vectors(self, vectors: np.ndarray, k: int,
+                        filters: Optional[Dict[str, Any]] = None,
+                        mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """Run one FAISS search for a batch of vectors; returns row ids (-1 padded)
+
+        With ``filters`` the matching rows are computed from the attribute index
+        and pushed into FAISS as an ID selector; when few rows match they are
+        scored exactly instead, which is both faster and exact. A precomputed
+        ``mask`` of those rows may be passed instead of ``filters``.
+        """
+        self._prepare_for_search()
+        vectors = np.ascontiguousarray(vectors, dtype="float32")
+        if mask is None:
+            if not filters:
+                _, indices = self.index.search(vectors, min(k, len(self)))
+                return indices
+            mask = self._filter_mask(filters)
+
+        n_rows = len(mask)
+        candidates = np.flatnonzero(mask)
+        k = min(k, len(candidates))
+        if k == 0:
+            return np.full((len(vectors), 1), -1, dtype="int64")
+
+        if len(candidates) <= FILTER_EXACT_MAX_ROWS:
+            _, positions = faiss.knn(vectors, self._dense(candidates), k)
+            return np.where(positions >= 0, candidates[positions], -1)
+
+        bitmap = np.packbits(mask, bitorder="little")
+        selector = faiss.IDSelectorBitmap(n_rows, faiss.swig_ptr(bitmap))
+        params = search_parameters(self.active_index_mode, selector)
+        _, indices = self.index.search(vectors, k, params=params)
+        return indices
+
+    def search_similar_customers(self, query_text: str, k: int = 5,
+                                 filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Search for similar customers based on a query, optionally filtered
+
+        See ``AttributeIndex`` for the filter syntax.
+        """
+        return self.search_similar_customers_batch([query_text], k=k, filters=filters)[0]
+
+    def search_similar_customers_batch(self, query_texts: List[str], k: int = 5,
+                                       filters: Optional[Dict[str, Any]] = None
+                                       ) -> List[List[Dict[str, Any]]]:
+        """Search for many queries with one encode call and one FAISS search"""
+        if not self._id_to_row or not query_texts:
+            return [[] for _ in query_texts]
+
+        # Generate query embeddings
+        query_embeddings = self.model.encode(query_texts)
 
-        # Generate query embedding
-        query_embedding = self.model.encode([query_text])
-        
         # Search in FAISS
-        distances, indices = self.index.search(
-            np.array(query_embedding).astype('float32'), 
-            min(k, len(self.stored_data))
-        )
-        
+        indices = self._search_vectors(query_embeddings, k, filters)
+
         # Return similar customers
-        return [self.stored_data[idx] for idx in indices[0]]
+        return [self._table.records([idx for idx in row if idx >= 0]) for row in indices]
+
+    def hybrid_search(self, query_text: str, k: int = 5,
+                      filters: Optional[Dict[str, Any]] = None,
+                      candidates: int = 50) -> List[Dict[str, Any]]:
+        """Keyword (BM25) and vector search fused by reciprocal rank
+
+        Filters restrict both rankings before they are fused. When the best
+        lexical hit clearly dominates (a SKU, an exact product name) and there
+        are at least ``k`` lexical hits, the lexical ranking is returned
+        without running dense search.
+        """
+        if not self._id_to_row:
+            return []
+
+        mask = self._filter_mask(filters) if filters else None
+        lexical = self._lexical.search(query_text, max(candidates, k), mask)
+
+        if len(lexical) >= max(k, 1) and (
+            len(lexical) == 1
+            or lexical[0][1] >= LEXICAL_SHORT_CIRCUIT_RATIO * lexical[1][1]
+        ):
+            return self._table.records([row for row, _ in lexical[:k]])
+
+        dense = self._search_vectors(self.model.encode([query_text]), max(candidates, k), mask=mask)[0]
+
+        fused: Dict[int, float] = {}
+        for rank, (row, _) in enumerate(lexical):
+            fused[row] = fused.get(row, 0.0) + 1 / (HYBRID_RRF_K + rank + 1)
+        for rank, row in enumerate(row for row in dense if row >= 0):
+            fused[row] = fused.get(row, 0.0) + 1 / (HYBRID_RRF_K + rank + 1)
+
+        best = sorted(fused, key=fused.get, reverse=True)[:k]
+        return self._table.records(best)
+
+    def similar_customers_for_ids(self, customer_ids: List[Any], k: int = 5,
+                                  filters: Optional[Dict[str, Any]] = None
+                                  ) -> Dict[str, List[Dict[str, Any]]]:
+        """Nearest other customers for each known ID, reusing stored vectors
+
+        Served from the precomputed neighbour lists when they cover ``k`` and
+        no filter is given, otherwise by a single batched FAISS search.
+        """
+        keys = [self._customer_key(customer_id) for customer_id in customer_ids]
+        keys = [key for key in keys if key in self._id_to_row]
+        if not keys:
+            return {}
+        rows = [self._id_to_row[key] for key in keys]
+
+        if not filters and self._neighbours is not None and k <= self._neighbours.shape[1]:
+            neighbours = self._neighbours[rows]
+        else:
+            # One extra hit because each customer finds itself first
+            neighbours = self._search_vectors(self._dense(rows), k + 1, filters)
+
+        return {
+            key: self._table.records([idx for idx in found if idx >= 0 and idx != row][:k])
+            for key, row, found in zip(keys, rows, neighbours)
+        }
+
+    def attribute_values(self, name: str) -> np.ndarray:
+        """A numeric customer attribute (e.g. ``n_purchases``) for every live row"""
+        return self._attributes.column(name, self._live_rows())
+
+    def top_attribute_values(self, name: str, n: int = 10) -> List[Tuple[str, int]]:
+        """Most common products or channels with the number of customers holding them"""
+        return self._attributes.top_values(name, n)
+
+    def sample_vectors(self, n: int, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+        """Up to ``n`` random live rows and their float32 vectors"""
+        rows = self._live_rows()
+        if len(rows) > n:
+            rows = np.sort(np.random.default_rng(seed).choice(rows, n, replace=False))
+        return rows, self._dense(rows)
+
+    def nearest_similarities(self, rows: np.ndarray) -> np.ndarray:
+        """Cosine similarity of each row to its nearest other customer (NaN if none)"""
+        similarities = np.full(len(rows), np.nan, dtype="float32")
+        if len(self) < 2:
+            return similarities
+        if self._neighbours is not None and self._neighbours.shape[1]:
+            nearest = np.asarray(self._neighbours[rows, 0])
+        else:
+            found = self._search_vectors(self._dense(rows), 2)
+            nearest = np.where(found[:, 0] == rows, found[:, 1], found[:, 0])
+        known = nearest >= 0
+        if known.any():
+            similarities[known] = np.einsum(
+                "ij,ij->i", self._dense(rows[known]), self._dense(nearest[known])
+            )
+        return similarities
+
+    def precompute_neighbours(self, k: int = NEIGHBOUR_K, batch_size: int = 4096) -> None:
+        """Store the top-k neighbour rows of every customer; cleared on any write"""
+        neighbours = np.full((len(self._table), k), -1, dtype="int64")
+        live = self._live_rows()
+        for start in range(0, len(live), batch_size):
+            rows = live[start:start + batch_size]
+            found = self._search_vectors(self._dense(rows), k + 1)
+            for row, hits in zip(rows, found):
+                hits = hits[(hits >= 0) & (hits != row)][:k]
+                neighbours[row, :len(hits)] = hits
+        self._neighbours = neighbours
 
     def get_customer_context(self, customer_id: str) -> Dict[str, Any]:
         """Get customer context including similar customer patterns"""
-        customer = next(
-            (c for c in self.stored_data if c["customer_id"] == customer_id),
-            None
-        )
-        
+        customer = self.get_customer(customer_id)
+
         if not customer:
             return None
-            
-        # Find similar customers
-        similar_customers = self.search_similar_customers(
-            self._create_text_representation(customer),
-            k=3
+
+        # Find similar customers from the stored vector, excluding the customer itself
+        similar_customers = self.similar_customers_for_ids([customer_id], k=2).get(
+            self._customer_key(customer_id), []
         )
-        
-        # Remove the current customer from similar customers
-        similar_customers = [
-            c for c in similar_customers 
-            if c["customer_id"] != customer_id
-        ]
-        
+
         return {
             "customer": customer,
             "similar_patterns": similar_customers
         }
+
+    def benchmark_index_modes(self, vectors: Optional[np.ndarray] = None, k: int = 10,
+                              n_queries: int = 200, seed: int = 0) -> List[Dict[str, Any]]:
+        """Measure recall@k and query latency of each backend against exact search"""
+        if vectors is None:
+            vectors = self._dense(self._live_rows())
+        vectors = np.ascontiguousarray(vectors, dtype="float32")
+        n_vectors = len(vectors)
+        if n_vectors == 0:
+            return []
+        k = min(k, n_vectors)
+
+        rng = np.random.default_rng(seed)
+        queries = vectors[rng.choice(n_vectors, size=min(n_queries, n_vectors), replace=False)]
+        ids = np.arange(n_vectors, dtype="int64")
+
+        # Exact float32 flat goes first: its results are the ground truth for recall
+        configs = [("flat", "float32", {})]
+        if self.vector_dtype != "float32":
+            configs.append(("flat", self.vector_dtype, {}))
+        if n_vectors >= MIN_TRAINING_ROWS:
+            configs += [("ivf_flat", self.vector_dtype, {"nprobe": p}) for p in (1, 4, 16, 64)]
+            if n_vectors >= MIN_PQ_TRAINING_ROWS:
+                configs += [("ivf_pq", self.vector_dtype, {"nprobe": p}) for p in (4, 16, 64)]
+        configs += [("hnsw", self.vector_dtype, {"ef_search": ef}) for ef in (16, 64, 256)]
+
+        results = []
+        built = {}
+        truth = None
+        for mode, vector_dtype, params in configs:
+            if (mode, vector_dtype) not in built:
+                start = time.perf_counter()
+                index = build_index(mode, self.dimension, n_vectors, vector_dtype=vector_dtype)
+                if not index.is_trained:
+                    index.train(vectors)
+                index.add_with_ids(vectors, ids)
+                built[mode, vector_dtype] = (index, time.perf_counter() - start)
+            index, build_seconds = built[mode, vector_dtype]
+            set_search_parameters(index, mode, **params)
+
+            start = time.perf_counter()
+            _, found = index.search(queries, k)
+            elapsed = time.perf_counter() - start
+            if truth is None:
+                truth = found
+
+            hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+            results.append({
+                "mode": mode,
+                "vector_dtype": vector_dtype,
+                **params,
+                "recall_at_k": hits / truth.size,
+                "ms_per_query": 1000 * elapsed / len(queries),
+                "build_seconds": build_seconds,
+                "bytes_per_vector": index_nbytes(index) / n_vectors,
+            })
+        return results
+
+    def memory_report(self, sample_size: int = 1000) -> Dict[str, Any]:
+        """Bytes per customer now vs. the original list-of-dicts + float32 flat layout"""
+        n_customers = len(self)
+        if n_customers == 0:
+            return {"customers": 0}
+
+        rows = self._live_rows()
+        sample = self._table.records(rows[:sample_size])
+        dict_bytes = deep_sizeof(sample) / len(sample)
+        float32_vector_bytes = 4 * self.dimension
+
+        records_bytes = self._table.nbytes
+        index_bytes = index_nbytes(self.index)
+        id_map_bytes = deep_sizeof(self._id_to_row)
+        total = records_bytes + index_bytes + id_map_bytes
+        return {
+            "customers": n_customers,
+            "vector_dtype": self.vector_dtype,
+            "index_mode": self.active_index_mode,
+            "records_bytes": records_bytes,
+            "index_bytes": index_bytes,
+            "id_map_bytes": id_map_bytes,
+            "bytes_per_customer_before": dict_bytes + float32_vector_bytes,
+            "bytes_per_customer_after": total / n_customers,
+        }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Recall vs latency benchmark of FAISS index modes")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--snapshot", help="dataset fingerprint of a saved snapshot")
+    source.add_argument("--synthetic", type=int, help="number of random vectors to generate")
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.snapshot:
+        store = VectorStore.load_snapshot(args.snapshot, mmap=False)
+        if store is None:
+            parser.error(f"No snapshot found for {args.snapshot}")
+        bench_vectors = None
+    else:
+        store = VectorStore()
+        bench_vectors = np.random.default_rng(0).standard_normal(
+            (args.synthetic, store.dimension)).astype("float32")
+
+    for result in store.benchmark_index_modes(bench_vectors, k=args.k, n_queries=args.queries):
+        knob = ", ".join(f"{key}={result[key]}" for key in ("nprobe", "ef_search") if key in result)
+        print(
+            f"{result['mode']:<9} {result['vector_dtype']:<8} {knob:<14} recall@{args.k}={result['recall_at_k']:.3f} "
+            f"{result['ms_per_query']:.3f} ms/query  build {result['build_seconds']:.1f}s  "
+            f"{result['bytes_per_vector']:.0f} B/vector"
+        )